@@ -1,13 +1,53 @@
 # database.py - Enhanced Database Layer with Multi-Combination Support
 import sqlite3
 import hashlib
+import hmac
+import secrets
+import functools
 import json
+import logging
+import queue
+import threading
+import weakref
+from contextlib import contextmanager
 from datetime import datetime
 import time
 import os
 from typing import Dict, List, Optional, Any
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
+
+# orjson 3.9+ can embed stored JSON in a response verbatim via orjson.Fragment
+RAW_JSON_SUPPORTED = orjson is not None and hasattr(orjson, 'Fragment')
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so one except clause covers both
+if orjson is not None:
+    def _dumps(obj) -> str:
+        """Serialize a value to a JSON string for TEXT columns"""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def _dumps_blob(obj) -> bytes:
+        """Serialize a value to JSON bytes, stored as a BLOB without a UTF-8 round trip"""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    _loads = orjson.loads
+else:
+    def _dumps(obj) -> str:
+        """Serialize a value to a JSON string for TEXT columns"""
+        return json.dumps(obj, ensure_ascii=False)
+
+    def _dumps_blob(obj) -> bytes:
+        """Serialize a value to JSON bytes for BLOB columns"""
+        return json.dumps(obj, ensure_ascii=False).encode()
+
+    _loads = json.loads
+
 def get_local_timestamp():
     """Get current local timestamp in YYYY-MM-DD HH:MM:SS format"""
     return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -16,17 +56,187 @@ def get_local_datetime():
     """Get current local datetime object"""
     return datetime.now()
 
+PASSWORD_HASH_ALGORITHM = "pbkdf2_sha256"
+PASSWORD_HASH_ITERATIONS = 260000
+
+def hash_password(password: str, salt: str = None, iterations: int = PASSWORD_HASH_ITERATIONS) -> str:
+    """Hash a password with PBKDF2-SHA256 as 'algorithm$iterations$salt$hash'"""
+    salt = salt or secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iterations).hex()
+    return f"{PASSWORD_HASH_ALGORITHM}${iterations}${salt}${digest}"
+
+def verify_password(password: str, stored_hash: str) -> bool:
+    """Check a password against an encoded hash (or a legacy unsalted SHA-256 digest)"""
+    if stored_hash.startswith(PASSWORD_HASH_ALGORITHM + "$"):
+        _, iterations, salt, _ = stored_hash.split("$")
+        candidate = hash_password(password, salt, int(iterations))
+    else:
+        candidate = hashlib.sha256(password.encode()).hexdigest()
+    return hmac.compare_digest(candidate, stored_hash)
+
+def password_needs_rehash(stored_hash: str) -> bool:
+    """True for legacy digests or hashes made with outdated parameters"""
+    return not stored_hash.startswith(f"{PASSWORD_HASH_ALGORITHM}${PASSWORD_HASH_ITERATIONS}$")
+
+# Pre-computed PBKDF2 hashes so startup never pays the KDF cost
+# admin / admin123 and demo / demo123
+DEFAULT_USERS = (
+    ("admin",
+     "pbkdf2_sha256$260000$731b3de474d0d646bb436532784a0550$c7062f16d55485a1e3857b88cb2c747484d01264c7928f9817ae7ecb8ade7d87",
+     "System Administrator", "admin@company.com", "admin"),
+    ("demo",
+     "pbkdf2_sha256$260000$8c0306b3d800b33974f6b40bd31ce35d$74d1aa7401252f1e2728bc6de8b0f09ec12c5943d339c72eb6e7bfe9559b7b75",
+     "Demo User", "demo@company.com", "user"),
+)
+
+# Applied once to every pooled connection when it is opened
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -131072",     # 128 MiB page cache
+    "PRAGMA mmap_size = 1073741824",   # 1 GiB memory-mapped reads
+    "PRAGMA journal_size_limit = 67108864",  # truncate the WAL back to 64 MiB after checkpoints
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+)
+
+# Seconds reader() waits for a free pooled connection before giving up
+READER_CHECKOUT_TIMEOUT = 30
+
+class ConnectionPool:
+    """Long-lived SQLite connections: one writer behind a lock, N pooled readers
+
+    Checkouts are re-entrant per thread: a nested reader() on a thread that
+    already holds a reader gets the same connection, and a nested writer()
+    joins the outer transaction. writer() owns the transaction: it commits
+    when the outermost block exits cleanly and rolls back if it raises, so
+    code inside a writer block never calls commit() itself.
+    """
+
+    def __init__(self, db_path: Path, size: int = 4):
+        self.db_path = db_path
+        self.size = size
+        self._readers = queue.LifoQueue(maxsize=size)
+        self._held_readers = {}  # thread ident -> reader connection
+        self._write_lock = threading.RLock()
+        self._write_depth = 0
+        self._writer = self._connect()
+        for _ in range(size):
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = ON")
+            self._readers.put(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def reader(self):
+        ident = threading.get_ident()
+        held = self._held_readers.get(ident)
+        if held is not None:
+            yield held
+            return
+        
+        try:
+            conn = self._readers.get(timeout=READER_CHECKOUT_TIMEOUT)
+        except queue.Empty:
+            # Every reader is checked out; usually a leaked generator or a runaway query
+            logger.error(f"❌ No pooled reader connection became free within {READER_CHECKOUT_TIMEOUT}s")
+            raise sqlite3.OperationalError("Timed out waiting for a pooled reader connection")
+        self._held_readers[ident] = conn
+        try:
+            yield conn
+        finally:
+            # Pop by the ident captured above: generators may be finished on another thread
+            self._held_readers.pop(ident, None)
+            self._readers.put(conn)
+
+    @contextmanager
+    def writer(self):
+        with self._write_lock:
+            self._write_depth += 1
+            try:
+                yield self._writer
+                if self._write_depth == 1:
+                    self._writer.commit()
+            except Exception:
+                if self._write_depth == 1:
+                    self._writer.rollback()
+                raise
+            finally:
+                self._write_depth -= 1
+
+    def close(self):
+        with self._write_lock:
+            try:
+                # Fold the WAL back into the database so it doesn't linger on disk
+                self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ WAL checkpoint on close failed: {e}")
+            self._writer.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+
 class Database:
-    def __init__(self, db_path: str = "endorsements.db"):
+    def __init__(self, db_path: str = "endorsements.db", pool_size: int = 4):
         self.db_path = Path(db_path)
-        self.init_database()
+        self.pool_size = pool_size
+        self.fts_enabled = False
+        self._pool = None
+        self._ready = False
+        self._init_lock = threading.RLock()
+        
+        # Forked workers must open their own connections instead of sharing the parent's
+        if hasattr(os, 'register_at_fork'):
+            after_fork = weakref.WeakMethod(self._reset_after_fork)
+            os.register_at_fork(after_in_child=lambda: after_fork() and after_fork()())
 
-    def get_connection(self):
-        return sqlite3.connect(self.db_path)
+    @property
+    def pool(self) -> ConnectionPool:
+        """Open the pool and create the schema on first use"""
+        if not self._ready:
+            with self._init_lock:
+                # init_database re-enters here on the same thread via get_connection
+                if self._pool is None:
+                    self._pool = ConnectionPool(self.db_path, self.pool_size)
+                    try:
+                        self.init_database()
+                    except Exception:
+                        self._pool.close()
+                        self._pool = None
+                        raise
+                    self._ready = True
+        return self._pool
+
+    def open(self):
+        """Open the pool and create the schema now instead of on the first query"""
+        self.pool  # the property does the work
+
+    def _reset_after_fork(self):
+        """Drop connections inherited from the parent process"""
+        self._pool = None
+        self._ready = False
+        self._init_lock = threading.RLock()
+
+    def close(self):
+        """Checkpoint and close the pool; the next query reopens it"""
+        with self._init_lock:
+            if self._pool is not None:
+                self._pool.close()
+            self._pool = None
+            self._ready = False
+
+    def get_connection(self, write: bool = False):
+        """Check out a pooled connection; writes go through the single writer"""
+        return self.pool.writer() if write else self.pool.reader()
 
     def init_database(self):
         """Initialize database tables with local datetime"""
-        with self.get_connection() as conn:
+        with self.get_connection(write=True) as conn:
             cursor = conn.cursor()
             
             # Users table - Updated to use local time
@@ -58,495 +268,799 @@ class Database:
                     file_group_id TEXT,
                     status TEXT DEFAULT 'In Review',
                     spanish_fields TEXT,
-                    json_data TEXT,
+                    json_data BLOB,
                     original_filename TEXT,
                     file_path TEXT,
                     uploaded_by TEXT,
                     created_at TEXT DEFAULT (datetime('now', 'localtime')),
-                    updated_at TEXT DEFAULT (datetime('now', 'localtime'))
+                    updated_at TEXT DEFAULT (datetime('now', 'localtime')),
+                    policy_number_norm INTEGER GENERATED ALWAYS AS (CAST(policy_number AS INTEGER)) VIRTUAL
                 )
             ''')
             
+            # Databases created before policy_number_norm existed get it added in place
+            cursor.execute("SELECT 1 FROM pragma_table_xinfo('endorsements') WHERE name = 'policy_number_norm'")
+            if cursor.fetchone() is None:
+                cursor.execute('''
+                    ALTER TABLE endorsements ADD COLUMN
+                    policy_number_norm INTEGER GENERATED ALWAYS AS (CAST(policy_number AS INTEGER)) VIRTUAL
+                ''')
+            
             # Indexes for better performance
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_policy_type ON endorsements(policy_number, endorsement_type)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_status ON endorsements(status)')
+            cursor.execute('DROP INDEX IF EXISTS idx_policy_type')  # superseded by idx_group_created
+            cursor.execute('DROP INDEX IF EXISTS idx_status')  # a prefix of idx_created_status
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_combination ON endorsements(combination_number)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_file_group ON endorsements(file_group_id)')
-            
-            # Create default admin user
-            self.create_default_users()
-            
-            conn.commit()
-            print(f"🕒 Database initialized with local time: {get_local_timestamp()}")
+
+            # Composite indexes so filtered list queries can read rows already in created_at order
+            # (id is included so keyset pagination on (created_at, id) needs no extra sort)
+            cursor.execute('DROP INDEX IF EXISTS idx_status_type_created')
+            cursor.execute('DROP INDEX IF EXISTS idx_policy_created')
+            # The list's policy filter is LIKE '%x%', which can't seek on a policy_number index
+            cursor.execute('DROP INDEX IF EXISTS idx_policy_created_id')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_status_type_created_id ON endorsements(status, endorsement_type, created_at DESC, id DESC)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_created_status ON endorsements(status, created_at DESC, id DESC)')
+            # Grouped listing and combination lookups walk (policy_number, endorsement_type) in order
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_group_created ON endorsements(policy_number, endorsement_type, created_at DESC)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_policy_norm_type ON endorsements(policy_number_norm, endorsement_type)')
+
+            # Stamp updated_at on every change unless the UPDATE set it explicitly
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_endorsements_touch AFTER UPDATE ON endorsements
+                WHEN NEW.updated_at IS OLD.updated_at
+                BEGIN
+                    UPDATE endorsements SET updated_at = datetime('now', 'localtime') WHERE id = NEW.id;
+                END
+            ''')
+
+            self.fts_enabled = self._init_search_index(cursor)
+
+        # Create default admin user
+        self.create_default_users()
+        logger.info(f"🕒 Database initialized with local time: {get_local_timestamp()}")
+
+    def _init_search_index(self, cursor) -> bool:
+        """Create the FTS5 trigram index used by search and keep it synced with triggers"""
+        try:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'endorsements_fts'")
+            exists = cursor.fetchone() is not None
+
+            if not exists:
+                # Prefer accent-insensitive matching ('poliza' finds 'póliza'); the
+                # remove_diacritics option needs SQLite 3.45+, so fall back to plain trigram
+                for tokenizer in FTS_TOKENIZERS:
+                    try:
+                        cursor.execute(f'''
+                            CREATE VIRTUAL TABLE endorsements_fts USING fts5(
+                                policy_number, endorsement_type, concepto_id, spanish_fields,
+                                content='endorsements', content_rowid='id', tokenize='{tokenizer}'
+                            )
+                        ''')
+                        break
+                    except sqlite3.OperationalError:
+                        if tokenizer == FTS_TOKENIZERS[-1]:
+                            raise
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS endorsements_fts_ai AFTER INSERT ON endorsements BEGIN
+                    INSERT INTO endorsements_fts(rowid, policy_number, endorsement_type, concepto_id, spanish_fields)
+                    VALUES (new.id, new.policy_number, new.endorsement_type, new.concepto_id, new.spanish_fields);
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS endorsements_fts_ad AFTER DELETE ON endorsements BEGIN
+                    INSERT INTO endorsements_fts(endorsements_fts, rowid, policy_number, endorsement_type, concepto_id, spanish_fields)
+                    VALUES ('delete', old.id, old.policy_number, old.endorsement_type, old.concepto_id, old.spanish_fields);
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS endorsements_fts_au
+                AFTER UPDATE OF policy_number, endorsement_type, concepto_id, spanish_fields ON endorsements BEGIN
+                    INSERT INTO endorsements_fts(endorsements_fts, rowid, policy_number, endorsement_type, concepto_id, spanish_fields)
+                    VALUES ('delete', old.id, old.policy_number, old.endorsement_type, old.concepto_id, old.spanish_fields);
+                    INSERT INTO endorsements_fts(rowid, policy_number, endorsement_type, concepto_id, spanish_fields)
+                    VALUES (new.id, new.policy_number, new.endorsement_type, new.concepto_id, new.spanish_fields);
+                END
+            ''')
+
+            # Index rows that existed before the search table was added
+            if not exists:
+                cursor.execute("INSERT INTO endorsements_fts(endorsements_fts) VALUES ('rebuild')")
+            return True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"⚠️ Full-text search unavailable, falling back to LIKE: {e}")
+            return False
 
     def create_default_users(self):
         """Create default users if they don't exist - Updated with local time"""
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(write=True) as conn:
                 cursor = conn.cursor()
                 current_time = get_local_timestamp()
                 
-                # Check if admin exists
-                cursor.execute("SELECT COUNT(*) FROM users WHERE username = 'admin'")
-                if cursor.fetchone()[0] == 0:
-                    admin_password = hashlib.sha256("admin123".encode()).hexdigest()
-                    cursor.execute('''
-                        INSERT INTO users (username, password_hash, full_name, email, role, created_at, updated_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', ("admin", admin_password, "System Administrator", "admin@company.com", "admin", current_time, current_time))
-                    print(f"✅ Created admin user at: {current_time}")
-                    
-                # Check if demo user exists
-                cursor.execute("SELECT COUNT(*) FROM users WHERE username = 'demo'")
-                if cursor.fetchone()[0] == 0:
-                    demo_password = hashlib.sha256("demo123".encode()).hexdigest()
-                    cursor.execute('''
-                        INSERT INTO users (username, password_hash, full_name, email, role, created_at, updated_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', ("demo", demo_password, "Demo User", "demo@company.com", "user", current_time, current_time))
-                    print(f"✅ Created demo user at: {current_time}")
-                
-                conn.commit()
+                # The UNIQUE username constraint skips users that already exist
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO users (username, password_hash, full_name, email, role, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', [user + (current_time, current_time) for user in DEFAULT_USERS])
+                if cursor.rowcount > 0:
+                    logger.debug(f"✅ Created {cursor.rowcount} default user(s) at: {current_time}")
         except Exception as e:
-            print(f"Error creating default users: {e}")
+            logger.error(f"Error creating default users: {e}")
+
+GET_USER_BY_USERNAME_SQL = '''
+    SELECT id, username, password_hash, full_name, email, role, created_at
+    FROM users 
+    WHERE username = ?
+'''
+
+# Seconds a cached user row may be served; changes made by other worker processes show up after this
+USER_CACHE_TTL = 30
+USER_CACHE_SIZE = 1024
 
 class UserModel:
     def __init__(self, db: Database):
         self.db = db
+        self._user_cache = {}  # username -> (TTL bucket, row); misses are never cached
+
+    def get_user_by_username(self, username: str) -> Optional[tuple]:
+        """Fetch a user row by username (cached briefly, cleared on local user changes)"""
+        ttl_bucket = int(time.monotonic() // USER_CACHE_TTL)
+        cached = self._user_cache.get(username)
+        if cached is not None and cached[0] == ttl_bucket:
+            return cached[1]
+        
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(GET_USER_BY_USERNAME_SQL, (username,))
+            row = cursor.fetchone()
+        
+        if row is not None:
+            if len(self._user_cache) >= USER_CACHE_SIZE:
+                self._user_cache.clear()
+            self._user_cache[username] = (ttl_bucket, row)
+        return row
 
     def authenticate(self, username: str, password: str) -> Optional[Dict]:
         """Authenticate user and return user data"""
         try:
-            password_hash = hashlib.sha256(password.encode()).hexdigest()
-            
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT id, username, full_name, email, role, created_at
-                    FROM users 
-                    WHERE username = ? AND password_hash = ?
-                ''', (username, password_hash))
-                
-                row = cursor.fetchone()
-                if row:
-                    return {
-                        'id': row[0],
-                        'username': row[1],
-                        'full_name': row[2],
-                        'email': row[3],
-                        'role': row[4],
-                        'created_at': row[5]
-                    }
-            return None
+            row = self.get_user_by_username(username)
+            if not row or not verify_password(password, row[2]):
+                return None
+
+            # Upgrade legacy SHA-256 digests the first time the password is seen
+            if password_needs_rehash(row[2]):
+                self.set_password(row[0], password)
+
+            return {
+                'id': row[0],
+                'username': row[1],
+                'full_name': row[3],
+                'email': row[4],
+                'role': row[5],
+                'created_at': row[6]
+            }
         except Exception as e:
-            print(f"Authentication error: {e}")
+            logger.error(f"Authentication error: {e}")
             return None
 
+    def set_password(self, user_id: int, password: str):
+        """Store a freshly hashed password for a user"""
+        with self.db.get_connection(write=True) as conn:
+            conn.execute(
+                "UPDATE users SET password_hash = ?, updated_at = ? WHERE id = ?",
+                (hash_password(password), get_local_timestamp(), user_id)
+            )
+        self._user_cache.clear()
+
     def create_user(self, username: str, password: str, full_name: str = None, 
                    email: str = None, role: str = 'user') -> int:
         """Create a new user"""
         try:
-            password_hash = hashlib.sha256(password.encode()).hexdigest()
+            password_hash = hash_password(password)
             
-            with self.db.get_connection() as conn:
+            with self.db.get_connection(write=True) as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT INTO users (username, password_hash, full_name, email, role)
                     VALUES (?, ?, ?, ?, ?)
                 ''', (username, password_hash, full_name, email, role))
-                conn.commit()
-                return cursor.lastrowid
+            self._user_cache.clear()
+            return cursor.lastrowid
         except sqlite3.IntegrityError:
             raise ValueError("Username already exists")
         except Exception as e:
-            print(f"Error creating user: {e}")
+            logger.error(f"Error creating user: {e}")
             raise
 
+# Full endorsement row, in table order
+ENDORSEMENT_COLUMNS = (
+    'id', 'policy_number', 'endorsement_type', 'endorsement_version',
+    'endorsement_validity', 'concepto_id', 'combination_number',
+    'combination_id', 'total_combinations', 'file_group_id', 'status',
+    'spanish_fields', 'json_data', 'original_filename', 'file_path',
+    'uploaded_by', 'created_at', 'updated_at'
+)
+
+# Columns that can be projected without pulling the JSON blobs
+ENDORSEMENT_SCALAR_COLUMNS = (
+    'id', 'policy_number', 'endorsement_type', 'endorsement_version',
+    'endorsement_validity', 'concepto_id', 'combination_number',
+    'combination_id', 'total_combinations', 'file_group_id', 'status',
+    'original_filename', 'file_path', 'uploaded_by', 'created_at', 'updated_at'
+)
+
+# Default projection for list views
+ENDORSEMENT_LIST_COLUMNS = (
+    'id', 'policy_number', 'endorsement_type', 'endorsement_version',
+    'endorsement_validity', 'concepto_id', 'combination_number', 'status',
+    'uploaded_by', 'created_at', 'updated_at'
+)
+
+# Endorsement workflow statuses, in the order the UI offers them
+STATUS_APPROVED = 'Approved'
+STATUS_REJECTED = 'Rejected'
+STATUS_IN_REVIEW = 'In Review'
+STATUS_VALUES = (STATUS_APPROVED, STATUS_REJECTED, STATUS_IN_REVIEW)
+
+INSERT_ENDORSEMENT_SQL = '''
+    INSERT INTO endorsements (
+        policy_number, endorsement_type, endorsement_version, 
+        endorsement_validity, concepto_id, combination_number,
+        combination_id, total_combinations, file_group_id, status,
+        spanish_fields, json_data, original_filename, file_path, uploaded_by
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Columns update_endorsement may set; id and the timestamps are managed here
+UPDATABLE_ENDORSEMENT_COLUMNS = frozenset(ENDORSEMENT_COLUMNS) - {'id', 'created_at', 'updated_at'}
+
+# JSON columns and how each is encoded for storage (empty values store '{}')
+JSON_COLUMN_ENCODERS = {
+    'spanish_fields': lambda value: _dumps(value) if value else '{}',
+    'json_data': lambda value: _dumps_blob(value) if value else b'{}',
+}
+
+@functools.lru_cache(maxsize=256)
+def _update_endorsement_sql(fields: tuple) -> str:
+    """UPDATE statement for one sorted tuple of whitelisted columns"""
+    set_clauses = ', '.join(f"{field} = ?" for field in fields)
+    return f"UPDATE endorsements SET {set_clauses} WHERE id = ?"
+
+# Seconds a cached dropdown lookup may be served before it is re-queried
+LOOKUP_CACHE_TTL = 30
+
+# Column order of the rows returned by get_endorsements_grouped
+GROUPED_ENDORSEMENT_COLUMNS = (
+    'policy_number', 'endorsement_type', 'endorsement_version',
+    'endorsement_validity', 'concepto_id', 'combination_count',
+    'status', 'created_at', 'updated_at', 'uploaded_by'
+)
+
+# Fixed statements are kept as module constants so every call hands sqlite3
+# the same SQL text and hits the per-connection prepared-statement cache
+SELECT_ENDORSEMENTS_SQL = f"SELECT {', '.join(ENDORSEMENT_COLUMNS)} FROM endorsements"
+
+GET_ENDORSEMENT_BY_ID_SQL = SELECT_ENDORSEMENTS_SQL + " WHERE id = ?"
+
+GET_ENDORSEMENTS_BY_FILE_GROUP_SQL = SELECT_ENDORSEMENTS_SQL + " WHERE file_group_id = ? ORDER BY id"
+
+# A policy number matches either verbatim or by integer value ('0100' == '100'), the
+# latter through the indexed policy_number_norm generated column
+POLICY_GROUP_FILTER = "(policy_number = ? OR policy_number_norm = ?) AND endorsement_type = ?"
+
+def policy_group_params(policy_number: str, endorsement_type: str) -> tuple:
+    """Parameters for POLICY_GROUP_FILTER; non-numeric policy numbers only match verbatim"""
+    try:
+        policy_int = int(policy_number)
+    except (ValueError, TypeError):
+        policy_int = None
+    return (policy_number, policy_int, endorsement_type)
+
+GET_COMBINATIONS_SQL = SELECT_ENDORSEMENTS_SQL + f'''
+    WHERE {POLICY_GROUP_FILTER}
+    ORDER BY combination_number
+'''
+
+# Group summaries only need these small columns, never the JSON blobs; the
+# status totals are window aggregates, repeated on every row
+GROUP_INFO_SQL = f'''
+    SELECT combination_number, created_at, uploaded_by,
+           SUM(CASE WHEN status = '{STATUS_APPROVED}' THEN 1 ELSE 0 END) OVER (),
+           SUM(CASE WHEN status = '{STATUS_REJECTED}' THEN 1 ELSE 0 END) OVER (),
+           SUM(CASE WHEN status = '{STATUS_IN_REVIEW}' THEN 1 ELSE 0 END) OVER ()
+    FROM endorsements
+    WHERE {POLICY_GROUP_FILTER}
+    ORDER BY combination_number
+'''
+
+DELETE_ENDORSEMENT_SQL = "DELETE FROM endorsements WHERE id = ?"
+
+DELETE_GROUP_SQL = f"DELETE FROM endorsements WHERE {POLICY_GROUP_FILTER}"
+
+# Search feeds the list view, so it returns list columns and skips the JSON blobs
+SELECT_ENDORSEMENT_LIST_SQL = f"SELECT {', '.join(ENDORSEMENT_LIST_COLUMNS)} FROM endorsements"
+
+SEARCH_ENDORSEMENTS_SQL = SELECT_ENDORSEMENT_LIST_SQL + '''
+    WHERE policy_number LIKE ? 
+       OR endorsement_type LIKE ? 
+       OR concepto_id LIKE ?
+       OR spanish_fields LIKE ?
+    ORDER BY created_at DESC
+    LIMIT 100
+'''
+
+SEARCH_ENDORSEMENTS_FTS_SQL = SELECT_ENDORSEMENT_LIST_SQL + '''
+    WHERE id IN (SELECT rowid FROM endorsements_fts WHERE endorsements_fts MATCH ?)
+    ORDER BY created_at DESC
+    LIMIT 100
+'''
+
+LIST_SORT_COLUMNS = frozenset({'created_at', 'updated_at', 'policy_number', 'endorsement_type', 'status'})
+SORT_DIRECTIONS = frozenset({'ASC', 'DESC'})
+# The only ordering after_created_at/after_id cursors can seek through
+KEYSET_SORT = ('created_at', 'DESC')
+
+def normalize_sort(sort_by: str, sort_order: str):
+    """Clamp a requested sort to a whitelisted (column, direction) pair"""
+    if sort_by not in LIST_SORT_COLUMNS:
+        return 'created_at', 'DESC'
+    sort_order = str(sort_order).upper()
+    return sort_by, sort_order if sort_order in SORT_DIRECTIONS else 'DESC'
+
+# Pre-built ORDER BY clauses for every whitelisted (column, direction) pair;
+# the flat list breaks ties on id so pages are stable when rows share a timestamp
+LIST_ORDER_BY = {
+    (column, direction): f" ORDER BY {column} {direction}, id {direction}"
+    for column in LIST_SORT_COLUMNS for direction in SORT_DIRECTIONS
+}
+GROUPED_ORDER_BY = {
+    (column, direction): f" ORDER BY {column} {direction}"
+    for column in LIST_SORT_COLUMNS for direction in SORT_DIRECTIONS
+}
+
+@functools.lru_cache(maxsize=256)
+def _list_query_template(select: str, has_status: bool, has_type: bool, has_policy: bool,
+                         sort_by: str, sort_order: str, keyset: bool) -> str:
+    """SQL text for one list-query shape; parameters are bound in filter order"""
+    query = f"SELECT {select} FROM endorsements WHERE 1=1"
+    if has_status:
+        query += " AND status = ?"
+    if has_type:
+        query += " AND endorsement_type = ?"
+    if has_policy:
+        query += " AND policy_number LIKE ?"
+    if keyset:
+        query += " AND (created_at, id) < (?, ?)"
+    query += LIST_ORDER_BY[(sort_by, sort_order)]
+    query += " LIMIT ?" if keyset else " LIMIT ? OFFSET ?"
+    return query
+
+@functools.lru_cache(maxsize=64)
+def _grouped_query_template(has_status: bool, has_type: bool, has_policy: bool,
+                            sort_by: str, sort_order: str) -> str:
+    """SQL text for one grouped-query shape; parameters are bound in filter order"""
+    query = '''
+        SELECT 
+            policy_number,
+            endorsement_type,
+            MIN(endorsement_version) as endorsement_version,
+            MIN(endorsement_validity) as endorsement_validity,
+            MIN(concepto_id) as concepto_id,
+            COUNT(*) as combination_count,
+            MIN(status) as status,
+            MIN(created_at) as created_at,
+            MAX(updated_at) as updated_at,
+            MIN(uploaded_by) as uploaded_by
+        FROM endorsements 
+        WHERE 1=1
+    '''
+    if has_status:
+        query += " AND status = ?"
+    if has_type:
+        query += " AND endorsement_type = ?"
+    if has_policy:
+        query += " AND policy_number LIKE ?"
+    query += " GROUP BY policy_number, endorsement_type"
+    query += GROUPED_ORDER_BY[(sort_by, sort_order)]
+    query += " LIMIT ? OFFSET ?"
+    return query
+
+# Tokenizers tried in order when the search index is first created
+FTS_TOKENIZERS = ('trigram remove_diacritics 1', 'trigram')
+
+# Trigram tokens need at least this many characters to match
+FTS_MIN_TERM_LENGTH = 3
+
+UNIQUE_ENDORSEMENT_TYPES_SQL = '''
+    SELECT DISTINCT endorsement_type 
+    FROM endorsements 
+    WHERE endorsement_type IS NOT NULL 
+    ORDER BY endorsement_type
+'''
+
+UNIQUE_POLICY_NUMBERS_SQL = '''
+    SELECT DISTINCT policy_number 
+    FROM endorsements 
+    WHERE policy_number IS NOT NULL 
+    ORDER BY policy_number
+'''
+
 class EndorsementModel:
     def __init__(self, db: Database):
         self.db = db
+        self._lookup_cache = {}  # lookup query -> (TTL bucket, values); one entry per fixed query
+
+    def _insert_params(self, endorsement_data: Dict) -> tuple:
+        """Build INSERT parameters for one endorsement, serializing the JSON fields"""
+        return (
+            endorsement_data.get('policy_number'),
+            endorsement_data.get('endorsement_type'),
+            endorsement_data.get('endorsement_version'),
+            endorsement_data.get('endorsement_validity'),
+            endorsement_data.get('concepto_id'),
+            endorsement_data.get('combination_number', 1),
+            endorsement_data.get('combination_id'),
+            endorsement_data.get('total_combinations', 1),
+            endorsement_data.get('file_group_id'),
+            endorsement_data.get('status', STATUS_IN_REVIEW),
+            _dumps(endorsement_data.get('spanish_fields', {})),
+            _dumps_blob(endorsement_data.get('json_data', {})),
+            endorsement_data.get('original_filename'),
+            endorsement_data.get('file_path'),
+            endorsement_data.get('uploaded_by')
+        )
 
     def create_endorsement(self, endorsement_data: Dict) -> int:
         """Create a new endorsement with local timestamp"""
         try:
-            with self.db.get_connection() as conn:
+            with self.db.get_connection(write=True) as conn:
                 cursor = conn.cursor()
-                current_time = get_local_timestamp()
-                
-                # Handle JSON serialization
-                spanish_fields_json = json.dumps(endorsement_data.get('spanish_fields', {}), ensure_ascii=False)
-                json_data_json = json.dumps(endorsement_data.get('json_data', {}), ensure_ascii=False)
-                
-                cursor.execute('''
-                    INSERT INTO endorsements (
-                        policy_number, endorsement_type, endorsement_version, 
-                        endorsement_validity, concepto_id, combination_number,
-                        combination_id, total_combinations, file_group_id, status,
-                        spanish_fields, json_data, original_filename, file_path, uploaded_by,
-                        created_at, updated_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    endorsement_data.get('policy_number'),
-                    endorsement_data.get('endorsement_type'),
-                    endorsement_data.get('endorsement_version'),
-                    endorsement_data.get('endorsement_validity'),
-                    endorsement_data.get('concepto_id'),
-                    endorsement_data.get('combination_number', 1),
-                    endorsement_data.get('combination_id'),
-                    endorsement_data.get('total_combinations', 1),
-                    endorsement_data.get('file_group_id'),
-                    endorsement_data.get('status', 'In Review'),
-                    spanish_fields_json,
-                    json_data_json,
-                    endorsement_data.get('original_filename'),
-                    endorsement_data.get('file_path'),
-                    endorsement_data.get('uploaded_by'),
-                    current_time,  # created_at
-                    current_time   # updated_at
-                ))
                 
-                conn.commit()
+                # created_at/updated_at come from the column defaults
+                cursor.execute(INSERT_ENDORSEMENT_SQL, self._insert_params(endorsement_data))
                 endorsement_id = cursor.lastrowid
-                print(f"✅ Created endorsement {endorsement_id} at: {current_time}")
+            
+            # Cleared after the writer block has committed so readers can't re-cache the old values
+            self.clear_lookup_cache()
+            logger.debug(f"✅ Created endorsement {endorsement_id}")
+            return endorsement_id
+            
+        except Exception as e:
+            logger.error(f"Error creating endorsement: {e}")
+            raise
 
-                return endorsement_id
+    def create_endorsements_bulk(self, data_list: List[Dict]) -> List[int]:
+        """Create many endorsements with one executemany in a single transaction"""
+        if not data_list:
+            return []
+        try:
+            with self.db.get_connection(write=True) as conn:
+                cursor = conn.cursor()
+                
+                # Take the write lock up front so the batch can't fail midway on SQLITE_BUSY
+                if not conn.in_transaction:
+                    cursor.execute("BEGIN IMMEDIATE")
+                cursor.executemany(INSERT_ENDORSEMENT_SQL,
+                                   [self._insert_params(data) for data in data_list])
+                
+                # executemany() leaves lastrowid unset; AUTOINCREMENT ids are consecutive
+                # inside this transaction because the writer connection is exclusive
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'endorsements'")
+                last_id = cursor.fetchone()[0]
+            
+            self.clear_lookup_cache()
+            endorsement_ids = list(range(last_id - len(data_list) + 1, last_id + 1))
+            logger.debug(f"✅ Created {len(endorsement_ids)} endorsements")
+            return endorsement_ids
             
         except Exception as e:
-            print(f"Error creating endorsement: {e}")
+            logger.error(f"Error creating endorsements: {e}")
             raise
 
     def get_endorsements(self, status: str = None, endorsement_type: str = None,
                         policy_number: str = None, limit: int = 50, offset: int = 0,
-                        sort_by: str = "created_at", sort_order: str = "DESC") -> List[Dict]:
-        """Get endorsements with filtering and pagination"""
+                        sort_by: str = "created_at", sort_order: str = "DESC",
+                        columns: tuple = ENDORSEMENT_LIST_COLUMNS,
+                        after_created_at: str = None, after_id: int = None) -> List[Dict]:
+        """Get endorsements with filtering and pagination (list columns only, no JSON parsing)
+
+        Passing after_created_at/after_id (the last row of the previous page) seeks
+        straight to the next page instead of skipping `offset` rows.
+        """
         try:
+            columns = tuple(c for c in columns if c in ENDORSEMENT_SCALAR_COLUMNS) or ENDORSEMENT_LIST_COLUMNS
+            query, params = self._build_list_query(', '.join(columns), status, endorsement_type,
+                                                   policy_number, limit, offset, sort_by, sort_order,
+                                                   after_created_at, after_id)
             with self.db.get_connection() as conn:
                 cursor = conn.cursor()
-                
-                query = "SELECT * FROM endorsements WHERE 1=1"
-                params = []
-                
-                if status:
-                    query += " AND status = ?"
-                    params.append(status)
-                
-                if endorsement_type:
-                    query += " AND endorsement_type = ?"
-                    params.append(endorsement_type)
-                
-                if policy_number:
-                    query += " AND policy_number LIKE ?"
-                    params.append(f"%{policy_number}%")
-                
-                # Add sorting
-                valid_sort_columns = ['created_at', 'updated_at', 'policy_number', 'endorsement_type', 'status']
-                if sort_by in valid_sort_columns:
-                    query += f" ORDER BY {sort_by} {sort_order}"
-                else:
-                    query += " ORDER BY created_at DESC"
-                
-                query += " LIMIT ? OFFSET ?"
-                params.extend([limit, offset])
-                
                 cursor.execute(query, params)
                 rows = cursor.fetchall()
                 
-                return [self._row_to_dict(row) for row in rows]
+                return [dict(zip(columns, row)) for row in rows]
         except Exception as e:
-            print(f"Error fetching endorsements: {e}")
+            logger.error(f"Error fetching endorsements: {e}")
             return []
 
+    def _build_list_query(self, select: str, status: str, endorsement_type: str, policy_number: str,
+                          limit: int, offset: int, sort_by: str, sort_order: str,
+                          after_created_at: str = None, after_id: int = None):
+        """Build the filtered/sorted/paginated SELECT used by the list methods"""
+        sort_by, sort_order = normalize_sort(sort_by, sort_order)
+        
+        # Keyset pagination only applies to the default newest-first ordering
+        keyset = (after_created_at is not None and after_id is not None
+                  and (sort_by, sort_order) == KEYSET_SORT)
+        
+        query = _list_query_template(select, bool(status), bool(endorsement_type), bool(policy_number),
+                                     sort_by, sort_order, keyset)
+        params = []
+        if status:
+            params.append(status)
+        if endorsement_type:
+            params.append(endorsement_type)
+        if policy_number:
+            params.append(f"%{policy_number}%")
+        if keyset:
+            params.extend([after_created_at, after_id, limit])
+        else:
+            params.extend([limit, offset])
+        return query, params
+
     def get_endorsements_grouped(self, status: str = None, endorsement_type: str = None,
                                 policy_number: str = None, limit: int = 50, offset: int = 0,
                                 sort_by: str = "created_at", sort_order: str = "DESC") -> List[Dict]:
         """Get endorsements grouped by policy_number and endorsement_type"""
         try:
+            sort_by, sort_order = normalize_sort(sort_by, sort_order)
+            
+            query = _grouped_query_template(bool(status), bool(endorsement_type), bool(policy_number),
+                                            sort_by, sort_order)
+            params = []
+            if status:
+                params.append(status)
+            if endorsement_type:
+                params.append(endorsement_type)
+            if policy_number:
+                params.append(f"%{policy_number}%")
+            params.extend([limit, offset])
+            
             with self.db.get_connection() as conn:
                 cursor = conn.cursor()
-                
-                query = '''
-                    SELECT 
-                        policy_number,
-                        endorsement_type,
-                        MIN(endorsement_version) as endorsement_version,
-                        MIN(endorsement_validity) as endorsement_validity,
-                        MIN(concepto_id) as concepto_id,
-                        COUNT(*) as combination_count,
-                        MIN(status) as status,
-                        MIN(created_at) as created_at,
-                        MAX(updated_at) as updated_at,
-                        MIN(uploaded_by) as uploaded_by
-                    FROM endorsements 
-                    WHERE 1=1
-                '''
-                params = []
-                
-                if status:
-                    query += " AND status = ?"
-                    params.append(status)
-                
-                if endorsement_type:
-                    query += " AND endorsement_type = ?"
-                    params.append(endorsement_type)
-                
-                if policy_number:
-                    query += " AND policy_number LIKE ?"
-                    params.append(f"%{policy_number}%")
-                
-                query += " GROUP BY policy_number, endorsement_type"
-                
-                # Add sorting
-                valid_sort_columns = ['created_at', 'updated_at', 'policy_number', 'endorsement_type', 'status']
-                if sort_by in valid_sort_columns:
-                    query += f" ORDER BY {sort_by} {sort_order}"
-                else:
-                    query += " ORDER BY created_at DESC"
-                
-                query += " LIMIT ? OFFSET ?"
-                params.extend([limit, offset])
-                
                 cursor.execute(query, params)
                 rows = cursor.fetchall()
                 
-                columns = ['policy_number', 'endorsement_type', 'endorsement_version', 
-                          'endorsement_validity', 'concepto_id', 'combination_count',
-                          'status', 'created_at', 'updated_at', 'uploaded_by']
-                
-                return [dict(zip(columns, row)) for row in rows]
+                return [dict(zip(GROUPED_ENDORSEMENT_COLUMNS, row)) for row in rows]
         except Exception as e:
-            print(f"Error fetching grouped endorsements: {e}")
+            logger.error(f"Error fetching grouped endorsements: {e}")
             return []
 
-    def get_endorsement_by_id(self, endorsement_id: int) -> Optional[Dict]:
-        """Get endorsement by ID"""
+    def get_endorsement_by_id(self, endorsement_id: int, raw_json: bool = False) -> Optional[Dict]:
+        """Get endorsement by ID (raw_json: see _row_to_dict)"""
         try:
             with self.db.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT * FROM endorsements WHERE id = ?", (endorsement_id,))
+                cursor.execute(GET_ENDORSEMENT_BY_ID_SQL, (endorsement_id,))
                 row = cursor.fetchone()
-                return self._row_to_dict(row) if row else None
+                return self._row_to_dict(row, raw_json) if row else None
         except Exception as e:
-            print(f"Error fetching endorsement by ID: {e}")
+            logger.error(f"Error fetching endorsement by ID: {e}")
             return None
 
-    def get_endorsement_combinations(self, policy_number: str, endorsement_type: str) -> List[Dict]:
-        """Get all combinations for a specific policy and endorsement type"""
+    def get_endorsements_by_file_group(self, file_group_id: str) -> List[Dict]:
+        """Get all endorsements created from one upload, in insertion order"""
         try:
             with self.db.get_connection() as conn:
                 cursor = conn.cursor()
-                
-                # Handle both string and integer policy numbers
-                try:
-                    policy_int = int(policy_number)
-                    cursor.execute('''
-                        SELECT * FROM endorsements 
-                        WHERE (policy_number = ? OR CAST(policy_number AS INTEGER) = ?) 
-                        AND endorsement_type = ?
-                        ORDER BY combination_number
-                    ''', (str(policy_int), policy_int, endorsement_type))
-                except (ValueError, TypeError):
-                    cursor.execute('''
-                        SELECT * FROM endorsements 
-                        WHERE policy_number = ? AND endorsement_type = ?
-                        ORDER BY combination_number
-                    ''', (policy_number, endorsement_type))
-                
+                cursor.execute(GET_ENDORSEMENTS_BY_FILE_GROUP_SQL, (file_group_id,))
                 rows = cursor.fetchall()
                 return [self._row_to_dict(row) for row in rows]
         except Exception as e:
-            print(f"Error fetching endorsement combinations: {e}")
+            logger.error(f"Error fetching endorsements by file group: {e}")
             return []
 
-    def update_endorsement(self, endorsement_id: int, update_data: Dict, updated_by: str = None) -> bool:
-        """Update endorsement with local timestamp"""
+    def get_endorsement_combinations(self, policy_number: str, endorsement_type: str,
+                                     raw_json: bool = False) -> List[Dict]:
+        """Get all combinations for a specific policy and endorsement type (raw_json: see _row_to_dict)"""
         try:
             with self.db.get_connection() as conn:
                 cursor = conn.cursor()
-                current_time = get_local_timestamp()
-                
-                # Build dynamic update query
-                set_clauses = []
-                params = []
                 
-                for field, value in update_data.items():
-                    if field in ['spanish_fields', 'json_data']:
-                        # Handle JSON fields
-                        set_clauses.append(f"{field} = ?")
-                        params.append(json.dumps(value, ensure_ascii=False) if value else '{}')
-                    else:
-                        set_clauses.append(f"{field} = ?")
-                        params.append(value)
+                cursor.execute(GET_COMBINATIONS_SQL, policy_group_params(policy_number, endorsement_type))
                 
-                if not set_clauses:
-                    return True  # Nothing to update
+                rows = cursor.fetchall()
+                return [self._row_to_dict(row, raw_json) for row in rows]
+        except Exception as e:
+            logger.error(f"Error fetching endorsement combinations: {e}")
+            return []
+
+    def update_endorsement(self, endorsement_id: int, update_data: Dict, updated_by: str = None) -> bool:
+        """Update endorsement with local timestamp"""
+        unknown = update_data.keys() - UPDATABLE_ENDORSEMENT_COLUMNS
+        if unknown:
+            logger.error(f"Error updating endorsement: unknown fields {sorted(unknown)}")
+            return False
+        
+        try:
+            with self.db.get_connection(write=True) as conn:
+                cursor = conn.cursor()
                 
-                # Add updated_at timestamp with local time
-                set_clauses.append("updated_at = ?")
-                params.append(current_time)
+                cursor.execute(GET_ENDORSEMENT_BY_ID_SQL, (endorsement_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    return False
+                current = self._row_to_dict(row)
                 
-                query = f"UPDATE endorsements SET {', '.join(set_clauses)} WHERE id = ?"
-                params.append(endorsement_id)
+                # Only the fields that actually changed are written
+                changed = tuple(sorted(
+                    field for field, value in update_data.items()
+                    if current.get(field) != ((value or {}) if field in JSON_COLUMN_ENCODERS else value)
+                ))
+                if not changed:
+                    return True  # Nothing changed, skip the write
                 
-                cursor.execute(query, params)
-                conn.commit()
+                params = [JSON_COLUMN_ENCODERS[field](update_data[field]) if field in JSON_COLUMN_ENCODERS
+                          else update_data[field] for field in changed]
+                params.append(endorsement_id)  # updated_at is set by trg_endorsements_touch
                 
-                if cursor.rowcount > 0:
-                    print(f"✅ Updated endorsement {endorsement_id} at: {current_time}")
-                    return True
-                return False
+                cursor.execute(_update_endorsement_sql(changed), params)
+                updated = cursor.rowcount > 0
+            
+            if 'policy_number' in changed or 'endorsement_type' in changed:
+                self.clear_lookup_cache()
+            
+            if updated:
+                logger.debug(f"✅ Updated endorsement {endorsement_id}")
+            return updated
         except Exception as e:
-            print(f"Error updating endorsement: {e}")
+            logger.error(f"Error updating endorsement: {e}")
             return False
 
     def delete_endorsement(self, endorsement_id: int) -> bool:
         """Delete a single endorsement"""
         try:
-            with self.db.get_connection() as conn:
+            with self.db.get_connection(write=True) as conn:
                 cursor = conn.cursor()
-                cursor.execute("DELETE FROM endorsements WHERE id = ?", (endorsement_id,))
-                conn.commit()
-                return cursor.rowcount > 0
+                cursor.execute(DELETE_ENDORSEMENT_SQL, (endorsement_id,))
+                deleted = cursor.rowcount > 0
+            
+            self.clear_lookup_cache()
+            return deleted
         except Exception as e:
-            print(f"Error deleting endorsement: {e}")
+            logger.error(f"Error deleting endorsement: {e}")
             return False
 
     def delete_endorsement_group(self, policy_number: str, endorsement_type: str) -> bool:
         """Delete all combinations for a specific policy and endorsement type"""
         try:
-            with self.db.get_connection() as conn:
+            with self.db.get_connection(write=True) as conn:
                 cursor = conn.cursor()
                 
-                # Handle both string and integer policy numbers
-                try:
-                    policy_int = int(policy_number)
-                    cursor.execute('''
-                        DELETE FROM endorsements 
-                        WHERE (policy_number = ? OR CAST(policy_number AS INTEGER) = ?) 
-                        AND endorsement_type = ?
-                    ''', (str(policy_int), policy_int, endorsement_type))
-                except (ValueError, TypeError):
-                    cursor.execute('''
-                        DELETE FROM endorsements 
-                        WHERE policy_number = ? AND endorsement_type = ?
-                    ''', (policy_number, endorsement_type))
-                
-                conn.commit()
+                cursor.execute(DELETE_GROUP_SQL, policy_group_params(policy_number, endorsement_type))
                 deleted_count = cursor.rowcount
-                
-                if deleted_count > 0:
-                    print(f"✅ Deleted {deleted_count} endorsement combinations for Policy #{policy_number}, Type: {endorsement_type}")
-                    return True
-                else:
-                    print(f"⚠️ No endorsements found to delete for Policy #{policy_number}, Type: {endorsement_type}")
-                    return False
+            
+            self.clear_lookup_cache()
+            if deleted_count > 0:
+                logger.debug(f"✅ Deleted {deleted_count} endorsement combinations for Policy #{policy_number}, Type: {endorsement_type}")
+                return True
+            else:
+                logger.warning(f"⚠️ No endorsements found to delete for Policy #{policy_number}, Type: {endorsement_type}")
+                return False
                     
         except Exception as e:
-            print(f"❌ Error deleting endorsement group: {e}")
+            logger.error(f"❌ Error deleting endorsement group: {e}")
             return False
 
     def get_endorsement_group_info(self, policy_number: str, endorsement_type: str) -> Dict[str, Any]:
         """Get information about an endorsement group (all combinations)"""
         try:
-            combinations = self.get_endorsement_combinations(policy_number, endorsement_type)
+            with self.db.get_connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute(GROUP_INFO_SQL, policy_group_params(policy_number, endorsement_type))
+                
+                rows = cursor.fetchall()
             
-            if not combinations:
+            if not rows:
                 return {}
             
+            _, created_at, uploaded_by, approved, rejected, in_review = rows[0]
             return {
                 'policy_number': policy_number,
                 'endorsement_type': endorsement_type,
-                'total_combinations': len(combinations),
-                'combination_numbers': [combo['combination_number'] for combo in combinations],
+                'total_combinations': len(rows),
+                'combination_numbers': [row[0] for row in rows],
                 'status_counts': {
-                    'approved': len([c for c in combinations if c['status'] == 'Approved']),
-                    'rejected': len([c for c in combinations if c['status'] == 'Rejected']),
-                    'in_review': len([c for c in combinations if c['status'] == 'In Review'])
+                    'approved': approved,
+                    'rejected': rejected,
+                    'in_review': in_review
                 },
-                'created_at': combinations[0]['created_at'] if combinations else None,
-                'uploaded_by': combinations[0]['uploaded_by'] if combinations else None
+                'created_at': created_at,
+                'uploaded_by': uploaded_by
             }
             
         except Exception as e:
-            print(f"❌ Error getting endorsement group info: {e}")
+            logger.error(f"❌ Error getting endorsement group info: {e}")
             return {}
 
     def search_endorsements(self, search_term: str) -> List[Dict]:
-        """Search endorsements by policy number, endorsement type, or concepto_id"""
+        """Search endorsements by policy number, endorsement type, concepto_id or field values (list columns only)"""
         try:
             with self.db.get_connection() as conn:
                 cursor = conn.cursor()
                 
-                query = '''
-                    SELECT * FROM endorsements 
-                    WHERE policy_number LIKE ? 
-                       OR endorsement_type LIKE ? 
-                       OR concepto_id LIKE ?
-                       OR spanish_fields LIKE ?
-                    ORDER BY created_at DESC
-                    LIMIT 100
-                '''
-                
-                search_pattern = f"%{search_term}%"
-                cursor.execute(query, (search_pattern, search_pattern, search_pattern, search_pattern))
+                # fts_enabled is only known once the connection above has initialized the schema
+                if self.db.fts_enabled and len(search_term) >= FTS_MIN_TERM_LENGTH:
+                    # Quote the term as a single phrase so it matches as a substring
+                    match_expr = '"' + search_term.replace('"', '""') + '"'
+                    cursor.execute(SEARCH_ENDORSEMENTS_FTS_SQL, (match_expr,))
+                else:
+                    search_pattern = f"%{search_term}%"
+                    cursor.execute(SEARCH_ENDORSEMENTS_SQL, (search_pattern, search_pattern, search_pattern, search_pattern))
                 rows = cursor.fetchall()
                 
-                return [self._row_to_dict(row) for row in rows]
+                return [dict(zip(ENDORSEMENT_LIST_COLUMNS, row)) for row in rows]
         except Exception as e:
-            print(f"Error searching endorsements: {e}")
+            logger.error(f"Error searching endorsements: {e}")
             return []
 
+    def _get_unique_values(self, query: str) -> tuple:
+        """Run a DISTINCT lookup query; cached until the next local write or the TTL bucket rolls over"""
+        # Writes made by other worker processes show up once the TTL bucket changes
+        ttl_bucket = int(time.monotonic() // LOOKUP_CACHE_TTL)
+        cached = self._lookup_cache.get(query)
+        if cached is not None and cached[0] == ttl_bucket:
+            return cached[1]
+        
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            values = tuple(row[0] for row in cursor.fetchall())
+        
+        self._lookup_cache[query] = (ttl_bucket, values)
+        return values
+
+    def clear_lookup_cache(self):
+        """Drop cached dropdown lookups after endorsements change"""
+        self._lookup_cache.clear()
+
     def get_unique_endorsement_types(self) -> List[str]:
         """Get all unique endorsement types"""
         try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT DISTINCT endorsement_type 
-                    FROM endorsements 
-                    WHERE endorsement_type IS NOT NULL 
-                    ORDER BY endorsement_type
-                ''')
-                rows = cursor.fetchall()
-                return [row[0] for row in rows]
+            return list(self._get_unique_values(UNIQUE_ENDORSEMENT_TYPES_SQL))
         except Exception as e:
-            print(f"Error fetching endorsement types: {e}")
+            logger.error(f"Error fetching endorsement types: {e}")
             return []
 
     def get_unique_policy_numbers(self) -> List[str]:
         """Get all unique policy numbers"""
         try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT DISTINCT policy_number 
-                    FROM endorsements 
-                    WHERE policy_number IS NOT NULL 
-                    ORDER BY policy_number
-                ''')
-                rows = cursor.fetchall()
-                return [row[0] for row in rows]
+            return list(self._get_unique_values(UNIQUE_POLICY_NUMBERS_SQL))
         except Exception as e:
-            print(f"Error fetching policy numbers: {e}")
+            logger.error(f"Error fetching policy numbers: {e}")
             return []
 
-    def _row_to_dict(self, row) -> Dict:
-        """Convert database row to dictionary"""
+    def _row_to_dict(self, row, raw_json: bool = False) -> Dict:
+        """Convert database row to dictionary
+
+        With raw_json (and RAW_JSON_SUPPORTED), spanish_fields/json_data are left
+        unparsed as orjson.Fragment values that an ORJSONResponse writes out verbatim.
+        """
         if not row:
             return {}
         
         try:
-            columns = ['id', 'policy_number', 'endorsement_type', 'endorsement_version',
-                      'endorsement_validity', 'concepto_id', 'combination_number', 
-                      'combination_id', 'total_combinations', 'file_group_id', 'status',
-                      'spanish_fields', 'json_data', 'original_filename', 'file_path',
-                      'uploaded_by', 'created_at', 'updated_at']
+            result = dict(zip(ENDORSEMENT_COLUMNS, row))
             
-            result = dict(zip(columns, row))
+            if raw_json and RAW_JSON_SUPPORTED:
+                result['spanish_fields'] = orjson.Fragment(result['spanish_fields'] or b'{}')
+                result['json_data'] = orjson.Fragment(result['json_data'] or b'{}')
+                return result
             
             # Parse JSON fields
             if result.get('spanish_fields'):
                 try:
-                    result['spanish_fields'] = json.loads(result['spanish_fields'])
+                    result['spanish_fields'] = _loads(result['spanish_fields'])
                 except (json.JSONDecodeError, TypeError):
                     result['spanish_fields'] = {}
             else:
@@ -554,7 +1068,7 @@ class EndorsementModel:
             
             if result.get('json_data'):
                 try:
-                    result['json_data'] = json.loads(result['json_data'])
+                    result['json_data'] = _loads(result['json_data'])
                 except (json.JSONDecodeError, TypeError):
                     result['json_data'] = {}
             else:
@@ -562,7 +1076,7 @@ class EndorsementModel:
             
             return result
         except Exception as e:
-            print(f"Error converting row to dict: {e}")
+            logger.error(f"Error converting row to dict: {e}")
             return {}
 
 # Global database instance
@@ -571,6 +1085,8 @@ user_model = UserModel(database)
 endorsement_model = EndorsementModel(database)
 
 if __name__ == "__main__":
+    # Setup is lazy, so force it before reporting success
+    database.open()
     print("✅ Database initialized successfully!")
     print(f"📁 Database file: {database.db_path}")
     
@@ -1,58 +1,182 @@
 # file_processor.py - Enhanced File Processor with Multi-Combination Support
 import os
 import json
+import shutil
 import pandas as pd
 import uuid
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Tuple
+from typing import BinaryIO, Dict, List, Any, Optional, Tuple, Union
 from datetime import datetime
 import logging
+import multiprocessing
 import re
+import unicodedata
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
 
 # Set up detailed logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Prefer the Rust-based calamine reader when installed (pandas >= 2.2 only);
+# otherwise let pandas pick its default engine (openpyxl in read-only mode for .xlsx)
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine' if tuple(int(p) for p in pd.__version__.split('.')[:2]) >= (2, 2) else None
+except ImportError:
+    EXCEL_ENGINE = None
+
+# Cell text for the meaningful-value checks is held in an Arrow-backed string column when
+# pyarrow is installed, so strip/compare run as Arrow kernels instead of per-object Python calls
+try:
+    import pyarrow  # noqa: F401
+    CELL_TEXT_DTYPE = 'string[pyarrow]'
+except ImportError:
+    CELL_TEXT_DTYPE = str
+
+# Column B markers for a Campo/Combinations sheet; the Spanish patterns use a lookahead so
+# overlapping names are all found and each distinct pattern is counted once
+CAMPO_INDICATOR_RE = re.compile('campo|field|parameter')
+SPANISH_FIELD_RE = re.compile('(?=(número|nombre|versión|ramo|año))')
+
+# Cell text treated as "no value", and the digit run taken as the policy number
+EMPTY_FIELD_VALUES = frozenset({'', 'nan', 'None', 'null'})
+DIGITS_RE = re.compile(r'\d+')
+
+# Only workbooks this large (on disk) with at least two sheets go to the worker pool; every
+# worker re-opens the workbook and results are pickled back, which only pays off for big sheets
+PARALLEL_WORKBOOK_MIN_BYTES = 2 * 1024 * 1024
+PARALLEL_SHEET_MIN = 2
+
+# Size of the shared sheet worker pool; bounded so concurrent uploads can't multiply processes
+SHEET_WORKERS = min(4, os.cpu_count() or 1)
+
+# Uploads are copied to disk in chunks of this size instead of being read into memory whole
+UPLOAD_COPY_CHUNK_SIZE = 1024 * 1024
+
+# Upper bound on remembered field-name classifications; the processor lives for the whole server run
+FIELD_NAME_CACHE_SIZE = 4096
+
+def get_file_extension(filename: str) -> str:
+    """Return the lowercased extension of a file name, including the dot"""
+    return os.path.splitext(filename)[1].lower()
+
+def meaningful_cells(frame: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Return the stripped text of each cell and a mask of cells that are not NA, blank or 'nan'"""
+    # NA cells stay NA under the Arrow dtype; the notna() term makes them False in the mask either way
+    text = frame.astype(CELL_TEXT_DTYPE)
+    stripped = text.apply(lambda col: col.str.strip())
+    return stripped, frame.notna() & (stripped != '') & (text != 'nan')
+
+def fold_field_name(field_name: str) -> str:
+    """Casefold a field name, strip accents and collapse whitespace (including NBSP)"""
+    decomposed = unicodedata.normalize('NFKD', field_name.casefold())
+    return ' '.join(''.join(c for c in decomposed if not unicodedata.combining(c)).split())
+
+def load_json(raw: Union[bytes, str]) -> Any:
+    """Parse a JSON document from bytes or text, using orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # The stdlib parser also accepts NaN/Infinity and integers wider than 64 bits
+            pass
+    return json.loads(raw)
+
 class FileProcessor:
     """Enhanced file processor with multi-combination support and comprehensive debugging"""
     
+    # Supported file extensions
+    supported_extensions = frozenset({'.xlsx', '.xls', '.json'})
+    
+    # Enhanced Spanish field mappings (case-insensitive), shared by every instance and by main.py
+    core_field_mappings = {
+        # Policy number variations
+        'número de póliza': 'policy_number',
+        'numero de poliza': 'policy_number',
+        'numero de póliza': 'policy_number',
+        'número de poliza': 'policy_number',
+        'policy_number': 'policy_number',
+        'poliza': 'policy_number',
+        'póliza': 'policy_number',
+        
+        # Endorsement type variations
+        'nombre del endoso': 'endorsement_type',
+        'tipo de endoso': 'endorsement_type',
+        'endorsement_type': 'endorsement_type',
+        'endoso': 'endorsement_type',
+        
+        # Version variations
+        'versión del endoso inicial': 'endorsement_version',
+        'version del endoso inicial': 'endorsement_version',
+        'versión del endoso': 'endorsement_version',
+        'version del endoso': 'endorsement_version',
+        'endorsement_version': 'endorsement_version',
+        'version': 'endorsement_version',
+        'versión': 'endorsement_version'
+    }
+    
+    # Keywords for partial matching when no exact field name is present
+    core_field_keywords = {
+        'policy_number': ('póliza', 'poliza', 'policy'),
+        'endorsement_type': ('endoso', 'endorsement', 'nombre'),
+        'endorsement_version': ('versión', 'version')
+    }
+    
+    # Exact names map to (target, rank); a later mapping entry wins when several match
+    _exact_field_lookup = {
+        name.lower(): (target, rank) for rank, (name, target) in enumerate(core_field_mappings.items())
+    }
+    # Accent/whitespace-insensitive fallback; names that fold together keep the highest rank
+    _folded_field_lookup = {}
+    for _name, _exact in _exact_field_lookup.items():
+        _folded = fold_field_name(_name)
+        if _folded not in _folded_field_lookup or _exact[1] > _folded_field_lookup[_folded][1]:
+            _folded_field_lookup[_folded] = _exact
+    del _name, _exact, _folded
+    # Highest rank per target: once every target has matched its highest-ranked name nothing can change
+    _final_exact_ranks = {target: rank for rank, target in enumerate(core_field_mappings.values())}
+    _partial_field_patterns = {
+        target: re.compile('|'.join(map(re.escape, words)))
+        for target, words in core_field_keywords.items()
+    }
+    
     def __init__(self, upload_dir: str = "uploads"):
         self.upload_dir = Path(upload_dir)
         self.upload_dir.mkdir(exist_ok=True)
         
-        # Supported file extensions
-        self.supported_extensions = {'.xlsx', '.xls', '.json'}
-        
-        # Enhanced Spanish field mappings (case-insensitive)
-        self.core_field_mappings = {
-            # Policy number variations
-            'número de póliza': 'policy_number',
-            'numero de poliza': 'policy_number',
-            'numero de póliza': 'policy_number',
-            'número de poliza': 'policy_number',
-            'policy_number': 'policy_number',
-            'poliza': 'policy_number',
-            'póliza': 'policy_number',
-            
-            # Endorsement type variations
-            'nombre del endoso': 'endorsement_type',
-            'tipo de endoso': 'endorsement_type',
-            'endorsement_type': 'endorsement_type',
-            'endoso': 'endorsement_type',
-            
-            # Version variations
-            'versión del endoso inicial': 'endorsement_version',
-            'version del endoso inicial': 'endorsement_version',
-            'versión del endoso': 'endorsement_version',
-            'version del endoso': 'endorsement_version',
-            'endorsement_version': 'endorsement_version',
-            'version': 'endorsement_version',
-            'versión': 'endorsement_version'
-        }
+        # Field name -> (exact match, partial targets); Campo names repeat across every combination
+        self._field_name_matches = {}
+        
+        # Long-lived sheet worker pool, started by the server with start_workers()
+        self._executor = None
+        self._worker_count = 0
+        self._executor_lock = threading.Lock()
+    
+    def start_workers(self, max_workers: int = SHEET_WORKERS):
+        """Start the shared sheet worker pool; without it every workbook is processed in-process"""
+        with self._executor_lock:
+            if self._executor is None and max_workers > 1:
+                self._executor = _new_sheet_executor(max_workers)
+                self._worker_count = max_workers
+                logger.info(f"⚡ Sheet worker pool ready ({max_workers} processes)")
+    
+    def shutdown_workers(self):
+        """Stop the sheet worker pool, cancelling sheets that have not started"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
     
     def save_uploaded_file(self, file_content: bytes, filename: str) -> str:
         """Save uploaded file and return the file path"""
-        file_extension = Path(filename).suffix
+        file_extension = os.path.splitext(filename)[1]
         unique_filename = f"{uuid.uuid4()}{file_extension}"
         file_path = self.upload_dir / unique_filename
         
@@ -65,9 +189,24 @@ class FileProcessor:
             logger.error(f"❌ Error saving file: {e}")
             raise Exception(f"Failed to save file: {str(e)}")
     
+    def save_uploaded_stream(self, file_stream: BinaryIO, filename: str) -> str:
+        """Copy an uploaded file object to disk in fixed-size chunks and return the file path"""
+        file_extension = os.path.splitext(filename)[1]
+        unique_filename = f"{uuid.uuid4()}{file_extension}"
+        file_path = self.upload_dir / unique_filename
+        
+        try:
+            with open(file_path, 'wb') as f:
+                shutil.copyfileobj(file_stream, f, UPLOAD_COPY_CHUNK_SIZE)
+            logger.info(f"✅ File saved: {file_path}")
+            return str(file_path)
+        except Exception as e:
+            logger.error(f"❌ Error saving file: {e}")
+            raise Exception(f"Failed to save file: {str(e)}")
+    
     def validate_file(self, filename: str, file_size: int) -> Tuple[bool, str]:
         """Validate file extension and size"""
-        file_extension = Path(filename).suffix.lower()
+        file_extension = get_file_extension(filename)
         
         if file_extension not in self.supported_extensions:
             return False, f"Unsupported file type. Supported: {', '.join(self.supported_extensions)}"
@@ -96,42 +235,40 @@ class FileProcessor:
             logger.info(f"📊 DataFrame columns: {list(df.columns)}")
             
             # Debug: Show first few rows of all columns
-            logger.info("📋 First 5 rows sample:")
-            for i in range(min(5, len(df))):
-                row_data = []
-                for j in range(min(6, len(df.columns))):  # Show first 6 columns
-                    value = df.iloc[i, j]
-                    col_name = df.columns[j] if j < len(df.columns) else f"Col_{j}"
-                    row_data.append(f"{col_name}='{value}'")
-                logger.info(f"   Row {i}: {', '.join(row_data)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("📋 First 5 rows sample:")
+                for i in range(min(5, len(df))):
+                    row_data = []
+                    for j in range(min(6, len(df.columns))):  # Show first 6 columns
+                        value = df.iloc[i, j]
+                        col_name = df.columns[j] if j < len(df.columns) else f"Col_{j}"
+                        row_data.append(f"{col_name}='{value}'")
+                    logger.debug("   Row %d: %s", i, ', '.join(row_data))
             
             # Look for "Campo" in column B (index 1)
             if len(df.columns) > 1:
                 logger.info("🔍 Checking Column B for 'Campo' indicators...")
-                col_b_values = df.iloc[:, 1].astype(str).str.lower()
-                logger.info(f"   Column B values (first 10): {list(col_b_values.head(10))}")
-                
-                # Check for "campo" or field name patterns
-                campo_indicators = ['campo', 'field', 'parameter']
-                spanish_field_patterns = ['número', 'nombre', 'versión', 'ramo', 'año']
+                # Only the first 15 values are scanned, so only those are stringified
+                col_b_values = df.iloc[:15, 1].fillna('').astype(str).str.lower()
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("   Column B values (first 10): %s", list(col_b_values.head(10)))
                 
+                # Check for "campo" or field name patterns in one regex scan each
                 has_campo = False
                 
                 # Check for explicit campo indicators
-                for indicator in campo_indicators:
-                    if any(indicator in val for val in col_b_values.head(10)):
-                        has_campo = True
-                        logger.info(f"✅ Found '{indicator}' indicator in Column B")
-                        break
+                indicator_match = CAMPO_INDICATOR_RE.search('\n'.join(col_b_values.head(10)))
+                if indicator_match:
+                    has_campo = True
+                    logger.info(f"✅ Found '{indicator_match.group()}' indicator in Column B")
                 
                 # Check for Spanish field patterns if no explicit campo found
                 if not has_campo:
                     logger.info("🔍 Looking for Spanish field patterns...")
-                    spanish_field_count = 0
-                    for pattern in spanish_field_patterns:
-                        if any(pattern in val for val in col_b_values.head(15)):
-                            spanish_field_count += 1
-                            logger.info(f"   Found Spanish field pattern: '{pattern}'")
+                    found_patterns = dict.fromkeys(SPANISH_FIELD_RE.findall('\n'.join(col_b_values.head(15))))
+                    spanish_field_count = len(found_patterns)
+                    for pattern in found_patterns:
+                        logger.info(f"   Found Spanish field pattern: '{pattern}'")
                     
                     if spanish_field_count >= 2:  # At least 2 Spanish patterns
                         has_campo = True
@@ -144,21 +281,17 @@ class FileProcessor:
                     # Find data columns starting from column C (index 2) or D (index 3)
                     logger.info("🔍 Checking for combination columns starting from column C...")
                     
-                    for col_idx in range(2, len(df.columns)):  # Start from column C
+                    # Count meaningful values in every candidate column at once
+                    _, meaningful = meaningful_cells(df.iloc[:, 2:])  # Start from column C
+                    meaningful_counts = meaningful.sum(axis=0).to_numpy()
+                    
+                    for col_idx, meaningful_count in enumerate(meaningful_counts, start=2):
                         col_header = str(df.columns[col_idx]).strip()
-                        col_data = df.iloc[:, col_idx].dropna()
+                        logger.info(f"   Column {col_idx} ({col_header}): {meaningful_count} meaningful values")
                         
-                        # Check if column has meaningful data
-                        non_empty_data = [str(val).strip() for val in col_data if str(val).strip() and str(val) != 'nan']
-                        
-                        logger.info(f"   Column {col_idx} ({col_header}): {len(non_empty_data)} meaningful values")
-                        
-                        if len(non_empty_data) >= 3:  # Has sufficient meaningful data
+                        if meaningful_count >= 3:  # Has sufficient meaningful data
                             structure_info['combination_columns'].append(col_idx)
                             logger.info(f"   ✅ Added Column {col_idx} as combination column")
-                            # Show sample data
-                            sample_data = non_empty_data[:3]
-                            logger.info(f"      Sample data: {sample_data}")
                     
                     structure_info['combination_count'] = len(structure_info['combination_columns'])
                     structure_info['data_start_column'] = structure_info['combination_columns'][0] if structure_info['combination_columns'] else None
@@ -187,91 +320,102 @@ class FileProcessor:
     
     def extract_core_fields_from_combination(self, combination_data: Dict[str, Any]) -> Dict[str, Any]:
         """Enhanced core fields extraction with fuzzy matching"""
-        logger.info("🔍 Extracting core fields from combination...")
-        logger.info(f"📝 Input data has {len(combination_data)} fields")
-        
-        # Debug: Show all available fields
-        logger.info("📋 Available fields:")
-        for field_name, field_value in list(combination_data.items())[:10]:  # Show first 10
-            logger.info(f"   '{field_name}' = '{field_value}'")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("🔍 Extracting core fields from combination (%d fields)", len(combination_data))
+            # Debug: Show all available fields
+            for field_name, field_value in list(combination_data.items())[:10]:  # Show first 10
+                logger.debug("   %r = %r", field_name, field_value)
         
-        core_fields = {}
-        
-        # Enhanced field matching with fuzzy logic
-        for spanish_field, english_field in self.core_field_mappings.items():
-            logger.debug(f"🔍 Looking for '{spanish_field}' -> '{english_field}'")
-            
-            # Try exact match first (case-insensitive)
-            for field_name, field_value in combination_data.items():
-                if spanish_field.lower() == field_name.lower().strip():
-                    logger.info(f"✅ Exact match found: '{field_name}' = '{field_value}'")
-                    core_fields[english_field] = self.process_field_value(field_value, english_field)
-                    break
+        # Single pass over the fields: remember the best exact match and the first partial match per target
+        exact_matches = {}
+        partial_matches = {}
+        settled = 0
+        for field_name, field_value in combination_data.items():
+            matches = self._field_name_matches.get(field_name)
+            if matches is None:
+                if len(self._field_name_matches) >= FIELD_NAME_CACHE_SIZE:
+                    self._field_name_matches.clear()
+                matches = self._field_name_matches[field_name] = self._classify_field_name(field_name)
+            exact, partial_targets = matches
             
-            # If no exact match, try partial matching
-            if english_field not in core_fields:
-                for field_name, field_value in combination_data.items():
-                    field_name_clean = field_name.lower().strip()
-                    
-                    # Check if key words match
-                    if english_field == 'policy_number':
-                        if any(word in field_name_clean for word in ['póliza', 'poliza', 'policy']):
-                            logger.info(f"✅ Partial match for policy: '{field_name}' = '{field_value}'")
-                            core_fields[english_field] = self.process_field_value(field_value, english_field)
-                            break
-                    elif english_field == 'endorsement_type':
-                        if any(word in field_name_clean for word in ['endoso', 'endorsement', 'nombre']):
-                            logger.info(f"✅ Partial match for endorsement: '{field_name}' = '{field_value}'")
-                            core_fields[english_field] = self.process_field_value(field_value, english_field)
+            if exact:
+                target, rank = exact
+                if target not in exact_matches or rank > exact_matches[target][0]:
+                    exact_matches[target] = (rank, field_name, field_value)
+                    if rank == self._final_exact_ranks[target]:
+                        settled += 1
+                        if settled == len(self._final_exact_ranks):
                             break
-                    elif english_field == 'endorsement_version':
-                        if any(word in field_name_clean for word in ['versión', 'version']):
-                            logger.info(f"✅ Partial match for version: '{field_name}' = '{field_value}'")
-                            core_fields[english_field] = self.process_field_value(field_value, english_field)
-                            break
-        
-        logger.info(f"✅ Extracted core fields: {core_fields}")
+            
+            for target in partial_targets:
+                if target not in partial_matches:
+                    partial_matches[target] = (field_name, field_value)
         
-        # Validation: Check if we have minimum viable data
-        has_policy = core_fields.get('policy_number') and str(core_fields['policy_number']).strip()
-        has_type = core_fields.get('endorsement_type') and str(core_fields['endorsement_type']).strip()
+        core_fields = {}
+        for target in self.core_field_keywords:
+            if target in exact_matches:
+                _, field_name, field_value = exact_matches[target]
+                if debug:
+                    logger.debug("✅ Exact match found: %r = %r", field_name, field_value)
+            elif target in partial_matches:
+                field_name, field_value = partial_matches[target]
+                if debug:
+                    logger.debug("✅ Partial match for %s: %r = %r", target, field_name, field_value)
+            else:
+                continue
+            core_fields[target] = self.process_field_value(field_value, target)
         
-        logger.info(f"📋 Validation - Has policy: {has_policy}, Has type: {has_type}")
+        if debug:
+            logger.debug("✅ Extracted core fields: %s", core_fields)
+            
+            # Validation: Check if we have minimum viable data
+            has_policy = core_fields.get('policy_number') and str(core_fields['policy_number']).strip()
+            has_type = core_fields.get('endorsement_type') and str(core_fields['endorsement_type']).strip()
+            logger.debug("📋 Validation - Has policy: %s, Has type: %s", has_policy, has_type)
         
         return core_fields
     
+    def _classify_field_name(self, field_name: str) -> Tuple[Optional[Tuple[str, int]], Tuple[str, ...]]:
+        """Normalize a field name once and find its exact and partial core-field targets"""
+        field_name_folded = fold_field_name(field_name)
+        # Every keyword has an unaccented form, so the folded name matches whatever the plain one would
+        partial_targets = tuple(
+            target for target, pattern in self._partial_field_patterns.items() if pattern.search(field_name_folded)
+        )
+        return self.match_core_field_name(field_name), partial_targets
+    
+    @classmethod
+    def match_core_field_name(cls, field_name: str) -> Optional[Tuple[str, int]]:
+        """(target, rank) for a field name that names a core field exactly, ignoring case, accents and spacing"""
+        return cls._exact_field_lookup.get(field_name.lower().strip()) or cls._folded_field_lookup.get(fold_field_name(field_name))
+    
     def process_field_value(self, field_value: Any, field_type: str) -> Any:
         """Process field value based on its type"""
-        if not field_value or str(field_value).strip() in ['', 'nan', 'None', 'null']:
+        if not field_value:
+            return None
+        
+        cleaned_value = str(field_value).strip()
+        if cleaned_value in EMPTY_FIELD_VALUES:
             return None
         
         if field_type == 'policy_number':
-            # Enhanced policy number extraction
-            try:
-                cleaned_value = str(field_value).strip()
-                # Try to extract numbers from the string
-                numbers = re.findall(r'\d+', cleaned_value)
-                if numbers:
-                    return numbers[0]  # Return first number found
-                else:
-                    return cleaned_value  # Return as-is if no numbers found
-            except:
-                return str(field_value).strip()
-        else:
-            return str(field_value).strip()
+            # Enhanced policy number extraction: first run of digits, or the value as-is if there are none
+            digits = DIGITS_RE.search(cleaned_value)
+            return digits.group() if digits else cleaned_value
+        return cleaned_value
     
     def process_campo_combinations_structure(self, df: pd.DataFrame, structure_info: Dict) -> List[Dict]:
         """Enhanced Campo/Combinations processing with detailed logging"""
         logger.info("🚀 Processing Campo/Combinations structure...")
         endorsements = []
+        skipped = 0
         
         try:
             campo_col = structure_info['campo_column']
             combination_columns = structure_info['combination_columns']
             
-            logger.info(f"📋 Processing setup:")
-            logger.info(f"   Campo column: {campo_col}")
-            logger.info(f"   Combination columns: {combination_columns}")
+            logger.info("📋 Processing setup: Campo column %s, combination columns %s", campo_col, combination_columns)
             
             # Get field names from Campo column (skip empty rows)
             campo_series = df.iloc[:, campo_col]
@@ -284,35 +428,34 @@ class FileProcessor:
                     field_names.append(clean_field)
                     field_row_mapping[clean_field] = idx
             
-            logger.info(f"📝 Found {len(field_names)} field names in Campo column")
-            logger.info(f"📝 Field names sample: {field_names[:10]}")
+            logger.info("📝 Found %d field names in Campo column, sample: %s", len(field_names), field_names[:10])
+            
+            debug = logger.isEnabledFor(logging.DEBUG)
+            
+            # Pull every (field row, combination column) cell out in one slice and filter it with vectorized string ops
+            field_rows = [field_row_mapping[field_name] for field_name in field_names]
+            clean_block, meaningful_block = meaningful_cells(df.iloc[field_rows, combination_columns])
+            clean_block = clean_block.to_numpy(dtype=object)
+            meaningful_block = meaningful_block.to_numpy(dtype=bool)
             
             # Process each combination column
             for col_idx, combination_col in enumerate(combination_columns):
                 combination_number = col_idx + 1
                 combination_data = {}
                 
-                logger.info(f"🔄 Processing combination {combination_number} (column index {combination_col})...")
+                logger.debug("🔄 Processing combination %d (column index %d)...", combination_number, combination_col)
                 
                 # Extract values for this combination
-                values_found = 0
-                for field_name in field_names:
-                    row_idx = field_row_mapping[field_name]
-                    
-                    try:
-                        if row_idx < len(df):
-                            field_value = df.iloc[row_idx, combination_col]
-                            
-                            if pd.notna(field_value) and str(field_value).strip() and str(field_value) != 'nan':
-                                clean_value = str(field_value).strip()
-                                combination_data[field_name] = clean_value
-                                values_found += 1
-                                logger.debug(f"   '{field_name}' = '{clean_value}'")
-                    except (IndexError, KeyError) as e:
-                        logger.debug(f"   Skipped '{field_name}': {e}")
-                        continue
+                value_rows = meaningful_block[:, col_idx].nonzero()[0]
+                values_found = len(value_rows)
+                for row in value_rows:
+                    field_name = field_names[row]
+                    clean_value = clean_block[row, col_idx]
+                    combination_data[field_name] = clean_value
+                    if debug:
+                        logger.debug("   %r = %r", field_name, clean_value)
                 
-                logger.info(f"📊 Combination {combination_number}: found {values_found} field values")
+                logger.debug("📊 Combination %d: found %d field values", combination_number, values_found)
                 
                 # Create endorsement if we have sufficient data
                 if values_found >= 3:  # Minimum threshold
@@ -342,20 +485,21 @@ class FileProcessor:
                         }
                         
                         endorsements.append(endorsement)
-                        logger.info(f"✅ Created endorsement for combination {combination_number}")
-                        logger.info(f"   Core fields: {core_fields}")
+                        logger.debug("✅ Created endorsement for combination %d: %s", combination_number, core_fields)
                     else:
-                        logger.warning(f"⚠️ Combination {combination_number} lacks required data")
-                        logger.warning(f"   Core fields: {core_fields}")
+                        skipped += 1
+                        logger.debug("⚠️ Combination %d lacks required data (core fields: %s)", combination_number, core_fields)
                 else:
-                    logger.warning(f"⚠️ Combination {combination_number} has insufficient data ({values_found} values)")
+                    skipped += 1
+                    logger.debug("⚠️ Combination %d has insufficient data (%d values)", combination_number, values_found)
         
         except Exception as e:
             logger.error(f"❌ Error processing campo combinations: {e}")
             import traceback
             traceback.print_exc()
         
-        logger.info(f"✅ Campo processing complete: {len(endorsements)} endorsements created")
+        logger.info("✅ Campo processing complete: %d endorsements created, %d combinations skipped",
+                    len(endorsements), skipped)
         return endorsements
     
     def process_record_based_table(self, df: pd.DataFrame, sheet_name: str) -> List[Dict]:
@@ -364,11 +508,14 @@ class FileProcessor:
         endorsements = []
         
         try:
-            for idx, row in df.iterrows():
-                row_data = {}
-                for col, value in row.items():
-                    if pd.notna(value) and str(value).strip() and str(value) != 'nan':
-                        row_data[str(col).strip()] = str(value).strip()
+            # Filter the whole sheet once, then walk plain arrays instead of building a Series per row
+            clean_values, meaningful = meaningful_cells(df)
+            clean_values = clean_values.to_numpy(dtype=object)
+            meaningful = meaningful.to_numpy(dtype=bool)
+            column_keys = [str(col).strip() for col in df.columns]
+            
+            for idx, row_values, row_mask in zip(df.index, clean_values, meaningful):
+                row_data = {column_keys[j]: row_values[j] for j in row_mask.nonzero()[0]}
                 
                 if len(row_data) >= 3:  # Minimum data threshold
                     core_fields = self.extract_core_fields_from_combination(row_data)
@@ -385,70 +532,105 @@ class FileProcessor:
                             'combination_id': f"row_{idx}"
                         }
                         endorsements.append(endorsement)
-                        logger.info(f"✅ Created endorsement from row {idx}")
+                        logger.debug("✅ Created endorsement from row %s", idx)
         
         except Exception as e:
             logger.error(f"❌ Error processing record-based table: {e}")
         
-        logger.info(f"✅ Record-based processing complete: {len(endorsements)} endorsements")
+        logger.info("✅ Record-based processing complete: %d endorsements from %d rows", len(endorsements), len(df))
         return endorsements
     
+    def _process_sheet(self, sheet_name: str, df: pd.DataFrame) -> Tuple[Dict[str, Any], List[Dict]]:
+        """Clean one sheet, detect its structure and extract its endorsements"""
+        logger.info(f"\n📋 Processing sheet: '{sheet_name}'")
+        logger.info(f"   Original shape: {df.shape}")
+        
+        # Clean the dataframe but preserve structure; remaining NaN cells are masked where they are read
+        df = df.dropna(how='all', axis=0)  # Remove completely empty rows
+        logger.info(f"   Shape after cleaning: {df.shape}")
+        
+        # Detect structure
+        structure_info = self.detect_excel_structure(df)
+        
+        # Store sheet information
+        sheet_info = {
+            'columns': list(df.columns),
+            'row_count': len(df),
+            'column_count': len(df.columns),
+            'structure_info': structure_info
+        }
+        
+        # Extract endorsements based on detected structure
+        sheet_endorsements = []
+        if structure_info['type'] == 'campo_combinations':
+            logger.info("📋 Using Campo/Combinations processing method")
+            sheet_endorsements = self.process_campo_combinations_structure(df, structure_info)
+        else:
+            logger.info("📋 Using record-based processing method")
+            sheet_endorsements = self.process_record_based_table(df, sheet_name)
+        
+        return sheet_info, sheet_endorsements
+    
+    def _use_sheet_workers(self, file_path: str, sheet_names: List[str]) -> bool:
+        """Whether a workbook is big enough to be worth sending to the worker pool"""
+        return (self._executor is not None and len(sheet_names) >= PARALLEL_SHEET_MIN
+                and os.path.getsize(file_path) >= PARALLEL_WORKBOOK_MIN_BYTES)
+    
+    def _process_sheets_parallel(self, file_path: str, sheet_names: List[str]) -> Optional[List[Tuple[Dict[str, Any], List[Dict]]]]:
+        """Process sheets in the worker pool; each worker parses its own sheet so no DataFrames are pickled"""
+        executor = self._executor
+        if executor is None:
+            return None
+        logger.info(f"⚡ Processing {len(sheet_names)} sheets in the worker pool")
+        try:
+            return list(executor.map(_process_sheet_from_file, [file_path] * len(sheet_names), sheet_names))
+        except BrokenProcessPool as e:
+            # A worker died (e.g. killed for memory); replace the pool and let the caller finish in-process
+            logger.warning(f"⚠️ Sheet worker pool failed, processing in-process instead: {e}")
+            with self._executor_lock:
+                if self._executor is executor:
+                    self._executor = _new_sheet_executor(self._worker_count)
+            executor.shutdown(wait=False)
+            return None
+    
     def process_excel_file(self, file_path: str) -> Dict[str, Any]:
         """Main Excel processing method with comprehensive debugging"""
         logger.info(f"📊 Starting Excel file processing: {file_path}")
         
         try:
-            # Read Excel file
-            excel_data = pd.read_excel(file_path, sheet_name=None, header=None)
-            logger.info(f"📋 Successfully read Excel file with {len(excel_data)} sheets")
-            
-            result = {
-                'file_type': 'excel',
-                'sheets': {},
-                'endorsements': [],
-                'metadata': {
-                    'total_sheets': len(excel_data),
-                    'processed_at': datetime.now().isoformat(),
-                    'processing_method': 'enhanced_debug',
-                    'file_path': file_path
-                }
-            }
-            
-            for sheet_name, df in excel_data.items():
-                logger.info(f"\n📋 Processing sheet: '{sheet_name}'")
-                logger.info(f"   Original shape: {df.shape}")
+            # Open the workbook once and parse one sheet at a time so only the current sheet is held in memory
+            with pd.ExcelFile(file_path, engine=EXCEL_ENGINE) as excel_file:
+                sheet_names = excel_file.sheet_names
+                logger.info(f"📋 Successfully opened Excel file with {len(sheet_names)} sheets")
                 
-                # Clean the dataframe but preserve structure
-                df = df.dropna(how='all', axis=0)  # Remove completely empty rows
-                df = df.fillna('')  # Fill NaN with empty string
-                logger.info(f"   Shape after cleaning: {df.shape}")
-                
-                # Detect structure
-                structure_info = self.detect_excel_structure(df)
-                
-                # Store sheet information
-                result['sheets'][sheet_name] = {
-                    'columns': list(df.columns),
-                    'row_count': len(df),
-                    'column_count': len(df.columns),
-                    'structure_info': structure_info
+                result = {
+                    'file_type': 'excel',
+                    'sheets': {},
+                    'endorsements': [],
+                    'metadata': {
+                        'total_sheets': len(sheet_names),
+                        'processed_at': datetime.now().isoformat(),
+                        'processing_method': 'enhanced_debug',
+                        'file_path': file_path
+                    }
                 }
                 
-                # Extract endorsements based on detected structure
-                sheet_endorsements = []
-                if structure_info['type'] == 'campo_combinations':
-                    logger.info("📋 Using Campo/Combinations processing method")
-                    sheet_endorsements = self.process_campo_combinations_structure(df, structure_info)
-                else:
-                    logger.info("📋 Using record-based processing method")
-                    sheet_endorsements = self.process_record_based_table(df, sheet_name)
+                sheet_results = None
+                if self._use_sheet_workers(file_path, sheet_names):
+                    sheet_results = self._process_sheets_parallel(file_path, sheet_names)
+                if sheet_results is None:
+                    # dtype=object skips type inference; every cell is turned into a string later anyway.
+                    # Sheets are parsed lazily, so each one is released before the next is read
+                    sheet_results = (self._process_sheet(sheet_name, excel_file.parse(sheet_name, header=None, dtype=object))
+                                     for sheet_name in sheet_names)
                 
-                result['endorsements'].extend(sheet_endorsements)
-                logger.info(f"📊 Sheet '{sheet_name}' produced {len(sheet_endorsements)} endorsements")
+                for sheet_name, (sheet_info, sheet_endorsements) in zip(sheet_names, sheet_results):
+                    result['sheets'][sheet_name] = sheet_info
+                    result['endorsements'].extend(sheet_endorsements)
+                    logger.info(f"📊 Sheet '{sheet_name}' produced {len(sheet_endorsements)} endorsements")
             
-            logger.info(f"\n✅ Excel processing COMPLETE!")
-            logger.info(f"   Total endorsements created: {len(result['endorsements'])}")
-            logger.info(f"   Processing method: {result['metadata']['processing_method']}")
+            logger.info("✅ Excel processing COMPLETE: %d endorsements from %d sheets (%s)",
+                        len(result['endorsements']), len(sheet_names), result['metadata']['processing_method'])
             
             return result
             
@@ -458,43 +640,42 @@ class FileProcessor:
             traceback.print_exc()
             raise Exception(f"Failed to process Excel file: {str(e)}")
     
-    def process_json_file(self, file_path: str) -> Dict[str, Any]:
-        """Process JSON file with combination support"""
+    def process_json_file(self, file_path: str, keep_raw: bool = False) -> Dict[str, Any]:
+        """Process JSON file with combination support; the parsed document is only returned when keep_raw is set"""
         try:
             logger.info(f"📄 Processing JSON file: {file_path}")
             
-            with open(file_path, 'r', encoding='utf-8') as f:
-                json_data = json.load(f)
+            with open(file_path, 'rb') as f:
+                json_data = load_json(f.read())
             
             result = {
                 'file_type': 'json',
-                'raw_data': json_data,
                 'endorsements': [],
                 'metadata': {
                     'processed_at': datetime.now().isoformat(),
                     'processing_method': 'enhanced_json'
                 }
             }
+            if keep_raw:
+                result['raw_data'] = json_data
             
             # Handle different JSON structures
+            items = []
             if isinstance(json_data, dict):
                 if 'combinations' in json_data:
-                    combinations = json_data['combinations']
-                    for idx, combo in enumerate(combinations):
-                        endorsement = self.process_json_combination(combo, idx + 1)
-                        if endorsement:
-                            result['endorsements'].append(endorsement)
+                    items = json_data['combinations']
                 else:
-                    endorsement = self.process_json_combination(json_data, 1)
-                    if endorsement:
-                        result['endorsements'].append(endorsement)
+                    items = [json_data]
             elif isinstance(json_data, list):
-                for idx, item in enumerate(json_data):
-                    endorsement = self.process_json_combination(item, idx + 1)
-                    if endorsement:
-                        result['endorsements'].append(endorsement)
+                items = json_data
             
-            logger.info(f"✅ JSON processing complete. Found {len(result['endorsements'])} endorsements")
+            for idx, item in enumerate(items):
+                endorsement = self.process_json_combination(item, idx + 1)
+                if endorsement:
+                    result['endorsements'].append(endorsement)
+            
+            logger.info("✅ JSON processing complete. Found %d endorsements (%d items skipped)",
+                        len(result['endorsements']), len(items) - len(result['endorsements']))
             return result
             
         except Exception as e:
@@ -533,23 +714,32 @@ class FileProcessor:
         """Flatten nested dictionary"""
         flattened = {}
         
-        for key, value in data.items():
-            new_key = f"{prefix}{separator}{key}" if prefix else key
-            
-            if isinstance(value, dict):
-                flattened.update(self.flatten_dict(value, new_key, separator))
-            elif isinstance(value, list) and value and isinstance(value[0], dict):
-                for i, item in enumerate(value):
-                    flattened.update(self.flatten_dict(item, f"{new_key}_{i}", separator))
+        # Depth-first walk with a stack of (prefix, items iterator) frames; keys come out
+        # in the same order as a recursive walk, without per-level dicts or calls
+        stack = [(prefix, iter(data.items()))]
+        while stack:
+            key_prefix, items = stack[-1]
+            for key, value in items:
+                new_key = f"{key_prefix}{separator}{key}" if key_prefix else key
+                
+                if isinstance(value, dict):
+                    stack.append((new_key, iter(value.items())))
+                    break
+                elif isinstance(value, list) and value and isinstance(value[0], dict):
+                    # Pushed in reverse so the first list item is walked first
+                    stack.extend((f"{new_key}_{i}", iter(item.items())) for i, item in reversed(list(enumerate(value))))
+                    break
+                else:
+                    flattened[new_key] = value
             else:
-                flattened[new_key] = value
+                stack.pop()
         
         return flattened
     
     def process_file(self, file_path: str, original_filename: str) -> Dict[str, Any]:
         """Main method to process any supported file type"""
         logger.info(f"🚀 Starting file processing: {original_filename}")
-        file_extension = Path(original_filename).suffix.lower()
+        file_extension = get_file_extension(original_filename)
         
         if file_extension in ['.xlsx', '.xls']:
             return self.process_excel_file(file_path)
@@ -559,6 +749,18 @@ class FileProcessor:
             raise Exception(f"Unsupported file type: {file_extension}")
 
 
+def _new_sheet_executor(max_workers: int) -> ProcessPoolExecutor:
+    """Worker pool for sheet processing; workers start on first use and then stay up"""
+    # spawn rather than fork: the server process already has threads and open SQLite connections
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+def _process_sheet_from_file(file_path: str, sheet_name: str) -> Tuple[Dict[str, Any], List[Dict]]:
+    """Worker entry point: parse a single sheet and extract its endorsements"""
+    with pd.ExcelFile(file_path, engine=EXCEL_ENGINE) as excel_file:
+        df = excel_file.parse(sheet_name, header=None, dtype=object)
+    return file_processor._process_sheet(sheet_name, df)
+
+
 # Create global instance
 file_processor = FileProcessor()
 
@@ -2,13 +2,13 @@
 import os
 import json
 import uuid
-import re
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 from pathlib import Path
 
 from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form, Request, status
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
@@ -16,8 +16,10 @@ from pydantic import BaseModel, Field
 import uvicorn
 
 # Import our enhanced modules
-from database import database, user_model, endorsement_model
-from file_processor import file_processor
+from database import (database, user_model, endorsement_model, RAW_JSON_SUPPORTED,
+                      STATUS_APPROVED, STATUS_REJECTED, STATUS_IN_REVIEW, STATUS_VALUES,
+                      KEYSET_SORT, normalize_sort)
+from file_processor import file_processor, FileProcessor, DIGITS_RE, load_json
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -47,6 +49,21 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Templates
 templates = Jinja2Templates(directory="templates")
 
+@app.on_event("startup")
+def start_file_workers():
+    """Start the shared worker pool used for large multi-sheet workbooks"""
+    file_processor.start_workers()
+
+@app.on_event("shutdown")
+def close_database():
+    """Checkpoint the WAL and close pooled connections on shutdown"""
+    database.close()
+
+@app.on_event("shutdown")
+def stop_file_workers():
+    """Stop the sheet worker pool"""
+    file_processor.shutdown_workers()
+
 # Simple session storage
 active_sessions = {}
 
@@ -71,7 +88,7 @@ class EndorsementCreate(BaseModel):
     combination_id: Optional[str] = None
     total_combinations: int = 1
     file_group_id: Optional[str] = None
-    status: str = "In Review"
+    status: str = STATUS_IN_REVIEW
     spanish_fields: Dict[str, Any] = {}
     json_data: Dict[str, Any] = {}
 
@@ -85,6 +102,10 @@ class EndorsementUpdate(BaseModel):
     spanish_fields: Optional[Dict[str, Any]] = None
     json_data: Optional[Dict[str, Any]] = None
 
+def json_response(content: Dict[str, Any]):
+    """Respond with orjson when stored JSON columns are passed through unparsed"""
+    return ORJSONResponse(content) if RAW_JSON_SUPPORTED else content
+
 # Authentication Dependencies
 def get_current_user(request: Request) -> Dict:
     """Get current user from session"""
@@ -115,46 +136,41 @@ def optional_current_user(request: Request) -> Optional[Dict]:
     except HTTPException:
         return None
 
+def write_json_file(file_path: Path, json_data: Any):
+    """Write parsed JSON to disk (blocking; run it in the threadpool from async routes)"""
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(json_data, f, ensure_ascii=False, indent=2)
+
+def update_endorsement_statuses(endorsement_ids: List[int], new_status: str, username: str) -> int:
+    """Set the status of several endorsements and return how many changed (blocking; run it in the threadpool)"""
+    updated_count = 0
+    for endorsement_id in endorsement_ids:
+        # update_endorsement returns False for ids that don't exist
+        if endorsement_model.update_endorsement(endorsement_id, {'status': new_status}, username):
+            updated_count += 1
+    return updated_count
+
 def extract_core_fields_from_json(json_data: Dict[str, Any]) -> Dict[str, Any]:
     """Extract core fields from JSON data"""
-    core_field_mappings = {
-        'número de póliza': 'policy_number',
-        'numero de poliza': 'policy_number',
-        'policy_number': 'policy_number',
-        'poliza': 'policy_number',
-        'póliza': 'policy_number',
-        
-        'nombre del endoso': 'endorsement_type',
-        'tipo de endoso': 'endorsement_type',
-        'endorsement_type': 'endorsement_type',
-        'endoso': 'endorsement_type',
-        
-        'versión del endoso inicial': 'endorsement_version',
-        'version del endoso inicial': 'endorsement_version',
-        'versión del endoso': 'endorsement_version',
-        'version del endoso': 'endorsement_version',
-        'endorsement_version': 'endorsement_version',
-        'version': 'endorsement_version',
-        'versión': 'endorsement_version'
-    }
+    # First value seen for each mapped field name (matched like spreadsheet headers), then apply them in mapping order
+    first_values = {}
+    for field_name, field_value in json_data.items():
+        match = FileProcessor.match_core_field_name(field_name)
+        if match is not None:
+            first_values.setdefault(match, field_value)
     
     core_fields = {}
     
-    for spanish_field, english_field in core_field_mappings.items():
-        for field_name, field_value in json_data.items():
-            if spanish_field.lower() == field_name.lower().strip():
-                if english_field == 'policy_number':
-                    # Extract policy number
-                    if field_value and str(field_value).strip():
-                        cleaned_value = str(field_value).strip()
-                        numbers = re.findall(r'\d+', cleaned_value)
-                        if numbers:
-                            core_fields[english_field] = numbers[0]
-                        else:
-                            core_fields[english_field] = cleaned_value
-                else:
-                    core_fields[english_field] = str(field_value).strip() if field_value else None
-                break
+    for english_field, rank in sorted(first_values, key=lambda match: match[1]):
+        field_value = first_values[(english_field, rank)]
+        if english_field == 'policy_number':
+            # Extract policy number
+            if field_value and str(field_value).strip():
+                cleaned_value = str(field_value).strip()
+                digits = DIGITS_RE.search(cleaned_value)
+                core_fields[english_field] = digits.group() if digits else cleaned_value
+        else:
+            core_fields[english_field] = str(field_value).strip() if field_value else None
     
     return core_fields
 
@@ -170,7 +186,8 @@ async def root(request: Request):
 async def login(request: LoginRequest):
     """Authenticate user and create session"""
     try:
-        user = user_model.authenticate(request.username, request.password)
+        # Password hashing is deliberately slow; keep it off the event loop
+        user = await run_in_threadpool(user_model.authenticate, request.username, request.password)
         
         if not user:
             return LoginResponse(
@@ -227,14 +244,18 @@ async def get_endorsements(
     offset: int = 0,
     sort_by: str = "created_at",
     sort_order: str = "DESC",
+    after_created_at: Optional[str] = None,
+    after_id: Optional[int] = None,
     current_user: Dict = Depends(get_current_user)
 ):
     """Get endorsements with enhanced multi-combination support"""
     try:
+        next_cursor = None
         if search_term:
-            endorsements = endorsement_model.search_endorsements(search_term)
+            endorsements = await run_in_threadpool(endorsement_model.search_endorsements, search_term)
         elif grouped:
-            endorsements = endorsement_model.get_endorsements_grouped(
+            endorsements = await run_in_threadpool(
+                endorsement_model.get_endorsements_grouped,
                 status=status,
                 endorsement_type=endorsement_type,
                 policy_number=policy_number,
@@ -244,21 +265,29 @@ async def get_endorsements(
                 sort_order=sort_order
             )
         else:
-            endorsements = endorsement_model.get_endorsements(
+            endorsements = await run_in_threadpool(
+                endorsement_model.get_endorsements,
                 status=status,
                 endorsement_type=endorsement_type,
                 policy_number=policy_number,
                 limit=limit,
                 offset=offset,
                 sort_by=sort_by,
-                sort_order=sort_order
+                sort_order=sort_order,
+                after_created_at=after_created_at,
+                after_id=after_id
             )
+            # Cursor for the next page: pass back as after_created_at/after_id (newest-first order only)
+            if len(endorsements) == limit and normalize_sort(sort_by, sort_order) == KEYSET_SORT:
+                last = endorsements[-1]
+                next_cursor = {"after_created_at": last["created_at"], "after_id": last["id"]}
         
         return {
             "success": True,
             "data": endorsements,
             "count": len(endorsements),
-            "grouped": grouped
+            "grouped": grouped,
+            "next_cursor": next_cursor
         }
         
     except Exception as e:
@@ -274,7 +303,8 @@ async def get_endorsement(
 ):
     """Get specific endorsement by ID"""
     try:
-        endorsement = endorsement_model.get_endorsement_by_id(endorsement_id)
+        # Row fetch runs off the event loop; JSON columns are forwarded without re-parsing
+        endorsement = await run_in_threadpool(endorsement_model.get_endorsement_by_id, endorsement_id, RAW_JSON_SUPPORTED)
         
         if not endorsement:
             raise HTTPException(
@@ -282,10 +312,10 @@ async def get_endorsement(
                 detail="Endorsement not found"
             )
         
-        return {
+        return json_response({
             "success": True,
             "data": endorsement
-        }
+        })
         
     except HTTPException:
         raise
@@ -306,7 +336,8 @@ async def get_endorsement_combinations(
     try:
         print(f"🔍 API: Getting combinations for Policy {policy_number}, Type {endorsement_type}")
         
-        combinations = endorsement_model.get_endorsement_combinations(policy_number, endorsement_type)
+        combinations = await run_in_threadpool(endorsement_model.get_endorsement_combinations,
+                                               policy_number, endorsement_type, RAW_JSON_SUPPORTED)
         
         if not combinations:
             raise HTTPException(
@@ -329,7 +360,7 @@ async def get_endorsement_combinations(
                 "combination_number": combo.get("combination_number", 1),
                 "combination_id": combo.get("combination_id", f"combo_{combo.get('id')}"),
                 "total_combinations": len(combinations),
-                "status": combo.get("status", "In Review"),
+                "status": combo.get("status", STATUS_IN_REVIEW),
                 "spanish_fields": combo.get("spanish_fields", {}),
                 "json_data": combo.get("json_data", {}),
                 "original_filename": combo.get("original_filename"),
@@ -342,13 +373,13 @@ async def get_endorsement_combinations(
         # Sort by combination_number for consistent display
         formatted_combinations.sort(key=lambda x: x.get("combination_number", 0))
         
-        return {
+        return json_response({
             "success": True,
             "data": formatted_combinations,
             "count": len(formatted_combinations),
             "policy_number": policy_number,
             "endorsement_type": endorsement_type
-        }
+        })
         
     except HTTPException:
         raise
@@ -384,8 +415,8 @@ async def create_endorsement(
             'uploaded_by': current_user['username']
         }
         
-        endorsement_id = endorsement_model.create_endorsement(endorsement_record)
-        created_endorsement = endorsement_model.get_endorsement_by_id(endorsement_id)
+        endorsement_id = await run_in_threadpool(endorsement_model.create_endorsement, endorsement_record)
+        created_endorsement = await run_in_threadpool(endorsement_model.get_endorsement_by_id, endorsement_id)
         
         return {
             "success": True,
@@ -408,7 +439,7 @@ async def update_endorsement(
     """Enhanced update endorsement with comprehensive field editing"""
     try:
         # Get existing endorsement
-        existing = endorsement_model.get_endorsement_by_id(endorsement_id)
+        existing = await run_in_threadpool(endorsement_model.get_endorsement_by_id, endorsement_id)
         if not existing:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -430,7 +461,8 @@ async def update_endorsement(
             }
         
         # Update the endorsement
-        success = endorsement_model.update_endorsement(
+        success = await run_in_threadpool(
+            endorsement_model.update_endorsement,
             endorsement_id,
             update_data,
             current_user["username"]
@@ -443,7 +475,7 @@ async def update_endorsement(
             )
         
         # Get updated endorsement
-        updated_endorsement = endorsement_model.get_endorsement_by_id(endorsement_id)
+        updated_endorsement = await run_in_threadpool(endorsement_model.get_endorsement_by_id, endorsement_id)
         
         return {
             "success": True,
@@ -467,7 +499,7 @@ async def delete_endorsement(
     """Delete an endorsement"""
     try:
         # Check if endorsement exists
-        existing = endorsement_model.get_endorsement_by_id(endorsement_id)
+        existing = await run_in_threadpool(endorsement_model.get_endorsement_by_id, endorsement_id)
         if not existing:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -475,7 +507,7 @@ async def delete_endorsement(
             )
         
         # Delete the endorsement
-        success = endorsement_model.delete_endorsement(endorsement_id)
+        success = await run_in_threadpool(endorsement_model.delete_endorsement, endorsement_id)
         
         if not success:
             raise HTTPException(
@@ -508,7 +540,7 @@ async def delete_endorsement_group(
         print(f"   Policy: {policy_number}, Type: {endorsement_type}")
         
         # Get group info before deletion
-        group_info = endorsement_model.get_endorsement_group_info(policy_number, endorsement_type)
+        group_info = await run_in_threadpool(endorsement_model.get_endorsement_group_info, policy_number, endorsement_type)
         
         if not group_info:
             raise HTTPException(
@@ -519,7 +551,7 @@ async def delete_endorsement_group(
         print(f"   Found {group_info['total_combinations']} combinations to delete")
         
         # Delete the entire group
-        success = endorsement_model.delete_endorsement_group(policy_number, endorsement_type)
+        success = await run_in_threadpool(endorsement_model.delete_endorsement_group, policy_number, endorsement_type)
         
         if not success:
             raise HTTPException(
@@ -566,20 +598,15 @@ async def bulk_update_status(
                 detail="endorsement_ids and status are required"
             )
         
-        if new_status not in ['Approved', 'Rejected', 'In Review']:
+        if new_status not in STATUS_VALUES:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid status value"
             )
         
-        updated_count = 0
-        for endorsement_id in endorsement_ids:
-            existing = endorsement_model.get_endorsement_by_id(endorsement_id)
-            if existing:
-                update_data = {'status': new_status}
-                
-                if endorsement_model.update_endorsement(endorsement_id, update_data, current_user["username"]):
-                    updated_count += 1
+        updated_count = await run_in_threadpool(
+            update_endorsement_statuses, endorsement_ids, new_status, current_user["username"]
+        )
         
         return {
             "success": True,
@@ -606,9 +633,13 @@ async def upload_file(
         print(f"📤 File Upload from user: {current_user.get('username')}")
         print(f"📄 File: {file.filename}, Size: {file.size}")
         
-        # Validate file
-        file_content = await file.read()
-        is_valid, message = file_processor.validate_file(file.filename, len(file_content))
+        # Validate file; the size comes from the spooled upload so the content is never read into memory
+        file_size = file.size
+        if file_size is None:
+            file.file.seek(0, os.SEEK_END)
+            file_size = file.file.tell()
+            file.file.seek(0)
+        is_valid, message = file_processor.validate_file(file.filename, file_size)
         
         if not is_valid:
             raise HTTPException(
@@ -616,14 +647,14 @@ async def upload_file(
                 detail=message
             )
         
-        # Save file
-        file_path = file_processor.save_uploaded_file(file_content, file.filename)
+        # Save file; blocking disk and CPU work runs in the threadpool, not on the event loop
+        file_path = await run_in_threadpool(file_processor.save_uploaded_stream, file.file, file.filename)
         
         # Process file
-        processed_data = file_processor.process_file(file_path, file.filename)
+        processed_data = await run_in_threadpool(file_processor.process_file, file_path, file.filename)
         
         # Create endorsements from processed data
-        created_endorsements = []
+        endorsement_records = []
         file_group_id = str(uuid.uuid4())
         
         for endorsement_data in processed_data.get('endorsements', []):
@@ -641,17 +672,20 @@ async def upload_file(
                     'combination_id': endorsement_data.get('combination_id'),
                     'total_combinations': len(processed_data.get('endorsements', [])),
                     'file_group_id': file_group_id,
-                    'status': 'In Review',
+                    'status': STATUS_IN_REVIEW,
                     'spanish_fields': endorsement_data.get('spanish_fields', {}),
                     'json_data': endorsement_data.get('all_fields', {}),
                     'original_filename': file.filename,
                     'file_path': file_path,
                     'uploaded_by': current_user['username']
                 }
-                
-                endorsement_id = endorsement_model.create_endorsement(endorsement_record)
-                created_endorsement = endorsement_model.get_endorsement_by_id(endorsement_id)
-                created_endorsements.append(created_endorsement)
+                endorsement_records.append(endorsement_record)
+        
+        # Insert all combinations in one transaction
+        created_endorsements = []
+        if endorsement_records:
+            await run_in_threadpool(endorsement_model.create_endorsements_bulk, endorsement_records)
+            created_endorsements = await run_in_threadpool(endorsement_model.get_endorsements_by_file_group, file_group_id)
         
         return {
             "success": True,
@@ -659,7 +693,7 @@ async def upload_file(
             "data": {
                 "file_info": {
                     "filename": file.filename,
-                    "size": len(file_content),
+                    "size": file_size,
                     "type": processed_data.get('file_type')
                 },
                 "processing_info": processed_data.get('metadata', {}),
@@ -694,7 +728,7 @@ async def upload_json_text(
         
         # Parse JSON
         try:
-            json_data = json.loads(json_text)
+            json_data = load_json(json_text)
             print(f"✅ JSON parsed successfully: {type(json_data)}")
         except json.JSONDecodeError as e:
             print(f"❌ JSON Parse Error: {e}")
@@ -710,13 +744,12 @@ async def upload_json_text(
         # Ensure uploads directory exists
         Path("uploads").mkdir(exist_ok=True)
         
-        with open(temp_file_path, 'w', encoding='utf-8') as f:
-            json.dump(json_data, f, ensure_ascii=False, indent=2)
+        await run_in_threadpool(write_json_file, temp_file_path, json_data)
         
         print(f"✅ Temporary JSON file created: {temp_file_path}")
         
         # Process JSON directly
-        created_endorsements = []
+        endorsement_records = []
         file_group_id = str(uuid.uuid4())
         
         # Handle single object or array
@@ -755,22 +788,24 @@ async def upload_json_text(
                     'combination_id': f"json_combo_{idx + 1}",
                     'total_combinations': len(endorsements_to_process),
                     'file_group_id': file_group_id,
-                    'status': 'In Review',
+                    'status': STATUS_IN_REVIEW,
                     'spanish_fields': json_endorsement,  # Keep original JSON as Spanish fields
                     'json_data': json_endorsement,       # Same data for json_data
                     'original_filename': 'json_upload.json',
                     'file_path': str(temp_file_path),
                     'uploaded_by': current_user['username']
                 }
-                
-                print(f"💾 Creating endorsement record for item {idx}")
-                endorsement_id = endorsement_model.create_endorsement(endorsement_record)
-                created_endorsement = endorsement_model.get_endorsement_by_id(endorsement_id)
-                created_endorsements.append(created_endorsement)
-                print(f"✅ Created endorsement {endorsement_id} for item {idx}")
+                endorsement_records.append(endorsement_record)
             else:
                 print(f"⚠️ Skipping item {idx} - insufficient data")
         
+        # Insert all items in one transaction
+        created_endorsements = []
+        if endorsement_records:
+            print(f"💾 Creating {len(endorsement_records)} endorsement records")
+            await run_in_threadpool(endorsement_model.create_endorsements_bulk, endorsement_records)
+            created_endorsements = await run_in_threadpool(endorsement_model.get_endorsements_by_file_group, file_group_id)
+        
         print(f"✅ JSON processing complete: {len(created_endorsements)} endorsements created")
         
         return {
@@ -804,7 +839,7 @@ async def upload_json_text(
 async def get_endorsement_types(current_user: Dict = Depends(get_current_user)):
     """Get all unique endorsement types for dropdown"""
     try:
-        types = endorsement_model.get_unique_endorsement_types()
+        types = await run_in_threadpool(endorsement_model.get_unique_endorsement_types)
         return {"success": True, "data": types}
     except Exception as e:
         raise HTTPException(
@@ -816,7 +851,7 @@ async def get_endorsement_types(current_user: Dict = Depends(get_current_user)):
 async def get_policy_numbers(current_user: Dict = Depends(get_current_user)):
     """Get all unique policy numbers for dropdown"""
     try:
-        numbers = endorsement_model.get_unique_policy_numbers()
+        numbers = await run_in_threadpool(endorsement_model.get_unique_policy_numbers)
         return {"success": True, "data": numbers}
     except Exception as e:
         raise HTTPException(
@@ -829,23 +864,25 @@ async def get_status_options():
     """Get available status options"""
     return {
         "success": True,
-        "data": ["Approved", "Rejected", "In Review"]
+        "data": list(STATUS_VALUES)
     }
 
 @app.get("/api/statistics")
 async def get_statistics(current_user: Dict = Depends(get_current_user)):
     """Get detailed statistics for dashboard"""
     try:
-        all_endorsements = endorsement_model.get_endorsements(limit=1000)
+        all_endorsements = await run_in_threadpool(endorsement_model.get_endorsements, limit=1000)
+        types = await run_in_threadpool(endorsement_model.get_unique_endorsement_types)
+        numbers = await run_in_threadpool(endorsement_model.get_unique_policy_numbers)
         
         stats = {
             'total_endorsements': len(all_endorsements),
-            'approved_count': len([e for e in all_endorsements if e.get('status') == 'Approved']),
-            'rejected_count': len([e for e in all_endorsements if e.get('status') == 'Rejected']),
-            'in_review_count': len([e for e in all_endorsements if e.get('status') == 'In Review']),
+            'approved_count': len([e for e in all_endorsements if e.get('status') == STATUS_APPROVED]),
+            'rejected_count': len([e for e in all_endorsements if e.get('status') == STATUS_REJECTED]),
+            'in_review_count': len([e for e in all_endorsements if e.get('status') == STATUS_IN_REVIEW]),
             'recent_uploads': len([e for e in all_endorsements if e.get('created_at')]),
-            'endorsement_types_count': len(endorsement_model.get_unique_endorsement_types()),
-            'policy_numbers_count': len(endorsement_model.get_unique_policy_numbers())
+            'endorsement_types_count': len(types),
+            'policy_numbers_count': len(numbers)
         }
         
         return {